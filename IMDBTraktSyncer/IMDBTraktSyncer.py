@@ -55,9 +55,11 @@ def main():
         from IMDBTraktSyncer import verifyCredentials as VC
         from IMDBTraktSyncer import checkChrome as CC
         from IMDBTraktSyncer import traktData
+        from IMDBTraktSyncer import traktBulk
         from IMDBTraktSyncer import imdbData
         from IMDBTraktSyncer import errorHandling as EH
         from IMDBTraktSyncer import errorLogger as EL
+        from IMDBTraktSyncer import rateLimiter as RL
         
         # Check if package is up to date
         CV.checkVersion()
@@ -256,14 +258,20 @@ def main():
             # Get Trakt Data
             print('Processing Trakt Data')
             trakt_encoded_username = traktData.get_trakt_encoded_username()
+            # Only download categories that changed on Trakt since the last run
+            trakt_last_activities = traktData.get_trakt_last_activities()
             if sync_watchlist_value or remove_watched_from_watchlists_value:
-                trakt_watchlist = traktData.get_trakt_watchlist(trakt_encoded_username)
+                trakt_watchlist = traktData.get_trakt_data_if_changed('watchlist', trakt_encoded_username, trakt_last_activities, traktData.get_trakt_watchlist)
             if sync_ratings_value or mark_rated_as_watched_value:
-                trakt_ratings = traktData.get_trakt_ratings(trakt_encoded_username)
+                trakt_ratings = traktData.get_trakt_data_if_changed('ratings', trakt_encoded_username, trakt_last_activities, traktData.get_trakt_ratings)
             if sync_reviews_value:
-                trakt_reviews = traktData.get_trakt_comments(trakt_encoded_username)
-            if sync_watch_history_value or remove_watched_from_watchlists_value or mark_rated_as_watched_value:
-                trakt_watch_history = traktData.get_trakt_watch_history(trakt_encoded_username)
+                trakt_reviews = traktData.get_trakt_data_if_changed('comments', trakt_encoded_username, trakt_last_activities, traktData.get_trakt_comments)
+            if sync_watch_history_value or mark_rated_as_watched_value:
+                trakt_watch_history = traktData.get_trakt_data_if_changed('history', trakt_encoded_username, trakt_last_activities, traktData.get_trakt_watch_history)
+            elif remove_watched_from_watchlists_value:
+                # Removing watched items from watchlists only needs the watched state, not the full play log
+                # Episode IMDB IDs are resolved from the watchlists once the IMDB watchlist is loaded
+                trakt_watch_history = traktData.get_trakt_data_if_changed('watched', trakt_encoded_username, trakt_last_activities, traktData.get_trakt_watched)
             print('Processing Trakt Data Complete')
             
             # Get IMDB Data
@@ -278,6 +286,9 @@ def main():
                 imdb_reviews, errors_found_getting_imdb_reviews, driver, wait = imdbData.get_imdb_reviews(driver, wait, directory)
             if sync_watch_history_value or remove_watched_from_watchlists_value or mark_rated_as_watched_value:
                 imdb_watch_history, imdb_watch_history_size, driver, wait = imdbData.get_imdb_checkins(driver, wait, directory)
+            if remove_watched_from_watchlists_value and not (sync_watch_history_value or mark_rated_as_watched_value):
+                # Watched episodes from /sync/watched have no IMDB IDs, match them to Trakt and IMDB watchlist episodes
+                trakt_watch_history = traktData.resolve_watched_episode_ids(trakt_watch_history, trakt_watchlist, imdb_watchlist)
             print('Processing IMDB Data Complete')
                         
             if sync_watchlist_value:
@@ -469,61 +480,32 @@ def main():
                     # Count the total number of items
                     num_items = len(trakt_watchlist_to_set)
                     item_count = 0
-
-                    for item in trakt_watchlist_to_set:
+                    
+                    # Submit items in chunks and report per-item outcomes
+                    url = "https://api.trakt.tv/sync/watchlist"
+                    response_counts = {}
+                    
+                    for item, success in traktBulk.submit_sync_items(url, trakt_watchlist_to_set, chunk_size=traktBulk.WATCHLIST_CHUNK_SIZE, counts=response_counts):
                         item_count += 1
                         
-                        imdb_id = item['IMDB_ID']
-                        media_type = item['Type']  # 'movie', 'show', or 'episode'
-
-                        url = f"https://api.trakt.tv/sync/watchlist"
-
-                        data = {
-                            "movies": [],
-                            "shows": [],
-                            "episodes": []
-                        }
-
-                        if media_type == 'movie':
-                            data['movies'].append({
-                                "ids": {
-                                    "imdb": imdb_id
-                                }
-                            })
-                        elif media_type == 'show':
-                            data['shows'].append({
-                                "ids": {
-                                    "imdb": imdb_id
-                                }
-                            })
-                        elif media_type == 'episode':
-                            data['episodes'].append({
-                                "ids": {
-                                    "imdb": imdb_id
-                                }
-                            })
+                        season_number = item.get('SeasonNumber')
+                        episode_number = item.get('EpisodeNumber')
+                        if season_number and episode_number:
+                            season_number = str(season_number).zfill(2)
+                            episode_number = str(episode_number).zfill(2)
+                            episode_title = f'[S{season_number}E{episode_number}] '
                         else:
-                            data = None
-
-                        if data:
-                            response = EH.make_trakt_request(url, payload=data)
-                            
-                            season_number = item.get('SeasonNumber')
-                            episode_number = item.get('EpisodeNumber')
-                            if season_number and episode_number:
-                                season_number = str(season_number).zfill(2)
-                                episode_number = str(episode_number).zfill(2)
-                                episode_title = f'[S{season_number}E{episode_number}] '
-                            else:
-                                episode_title = ''
+                            episode_title = ''
+                        
+                        if success:
+                            print(f" - Added {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watchlist ({item['IMDB_ID']})")
                             
-                            if response and response.status_code in [200, 201, 204]:
-                                print(f" - Added {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watchlist ({item['IMDB_ID']})")
-                                
-                            else:
-                                error_message = f"Failed to add {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watchlist ({item['IMDB_ID']})"
-                                print(f"   - {error_message}")
-                                EL.logger.error(error_message)
+                        else:
+                            error_message = f"Failed to add {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watchlist ({item['IMDB_ID']})"
+                            print(f"   - {error_message}")
+                            EL.logger.error(error_message)
+                    
+                    print(f" - Trakt Watchlist: {traktBulk.format_response_counts(response_counts)}")
 
                     print('Setting Trakt Watchlist Items Complete')
                 else:
@@ -532,6 +514,7 @@ def main():
                 # Set IMDB Watchlist Items
                 if imdb_watchlist_to_set:
                     print('Setting IMDB Watchlist Items')
+                    imdbData.record_imdb_write('watchlist')
                     
                     # Count the total number of items
                     num_items = len(imdb_watchlist_to_set)
@@ -623,68 +606,32 @@ def main():
                 if trakt_ratings_to_set:
                     print('Setting Trakt Ratings')
 
-                    # Set the API endpoints
-                    rate_url = "https://api.trakt.tv/sync/ratings"
-                    
                     # Count the total number of items
                     num_items = len(trakt_ratings_to_set)
                     item_count = 0
+                    response_counts = {}
                             
-                    # Loop through your data table and rate each item on Trakt
-                    for item in trakt_ratings_to_set:
+                    # Rate items on Trakt in chunks and report per-item outcomes
+                    for item, success in traktBulk.submit_ratings(trakt_ratings_to_set, chunk_size=traktBulk.RATINGS_CHUNK_SIZE, counts=response_counts):
                         item_count += 1
-                        if item["Type"] == "show":
-                            # This is a TV show
-                            data = {
-                                "shows": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    },
-                                    "rating": item["Rating"]
-                                }]
-                            }
-                        elif item["Type"] == "movie":
-                            # This is a movie
-                            data = {
-                                "movies": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    },
-                                    "rating": item["Rating"]
-                                }]
-                            }
-                        elif item["Type"] == "episode":
-                            # This is an episode
-                            data = {
-                                "episodes": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    },
-                                    "rating": item["Rating"]
-                                }]
-                            }
+                        
+                        season_number = item.get('SeasonNumber')
+                        episode_number = item.get('EpisodeNumber')
+                        if season_number and episode_number:
+                            season_number = str(season_number).zfill(2)
+                            episode_number = str(episode_number).zfill(2)
+                            episode_title = f'[S{season_number}E{episode_number}] '
                         else:
-                            data = None
+                            episode_title = ''
                         
-                        if data:
-                            # Make the API call to rate the item
-                            response = EH.make_trakt_request(rate_url, payload=data)
-                            
-                            season_number = item.get('SeasonNumber')
-                            episode_number = item.get('EpisodeNumber')
-                            if season_number and episode_number:
-                                season_number = str(season_number).zfill(2)
-                                episode_number = str(episode_number).zfill(2)
-                                episode_title = f'[S{season_number}E{episode_number}] '
-                            else:
-                                episode_title = ''
-                            
-                            if response and response.status_code in [200, 201, 204]:
-                                print(f" - Rated {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}): {item['Rating']}/10 on Trakt ({item['IMDB_ID']})")
-                            else:
-                                error_message = f"Failed rating {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}): {item['Rating']}/10 on Trakt ({item['IMDB_ID']})"
-                                print(f"   - {error_message}")
-                                EL.logger.error(error_message)
+                        if success:
+                            print(f" - Rated {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}): {item['Rating']}/10 on Trakt ({item['IMDB_ID']})")
+                        else:
+                            error_message = f"Failed rating {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}): {item['Rating']}/10 on Trakt ({item['IMDB_ID']})"
+                            print(f"   - {error_message}")
+                            EL.logger.error(error_message)
+                    
+                    print(f" - Trakt Ratings: {traktBulk.format_response_counts(response_counts)}")
 
                     print('Setting Trakt Ratings Complete')
                 else:
@@ -693,6 +640,7 @@ def main():
                 # Set IMDB Ratings
                 if imdb_ratings_to_set:
                     print('Setting IMDB Ratings')
+                    imdbData.record_imdb_write('ratings')
                         
                     # loop through each movie and TV show rating and submit rating on IMDB website
                     for i, item in enumerate(imdb_ratings_to_set, 1):
@@ -943,66 +891,32 @@ def main():
                 if trakt_watchlist_items_to_remove:
                     print('Removing Watched Items From Trakt Watchlist')
 
-                    # Set the API endpoint
-                    remove_url = "https://api.trakt.tv/sync/watchlist/remove"
-
                     # Count the total number of items
                     num_items = len(trakt_watchlist_items_to_remove)
                     item_count = 0
+                    response_counts = {}
 
-                    # Loop through the items to remove from the watchlist
-                    for item in trakt_watchlist_items_to_remove:
+                    # Remove items from the watchlist in chunks and report per-item outcomes
+                    for item, success in traktBulk.submit_watchlist_removals(trakt_watchlist_items_to_remove, chunk_size=traktBulk.WATCHLIST_REMOVE_CHUNK_SIZE, counts=response_counts):
                         item_count += 1
-                        if item["Type"] == "show":
-                            # This is a TV show
-                            data = {
-                                "shows": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    }
-                                }]
-                            }
-                        elif item["Type"] == "movie":
-                            # This is a movie
-                            data = {
-                                "movies": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    }
-                                }]
-                            }
-                        elif item["Type"] == "episode":
-                            
-                            # This is an episode
-                            data = {
-                                "episodes": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    }
-                                }]
-                            }
-                        else:
-                            data = None
 
-                        if data:
-                            # Make the API call to remove the item from the watchlist
-                            response = EH.make_trakt_request(remove_url, payload=data)
-
-                            season_number = item.get('SeasonNumber')
-                            episode_number = item.get('EpisodeNumber')
-                            if season_number and episode_number:
-                                season_number = str(season_number).zfill(2)
-                                episode_number = str(episode_number).zfill(2)
-                                episode_title = f'[S{season_number}E{episode_number}] '
-                            else:
-                                episode_title = ''
-                                                        
-                            if response and response.status_code in [200, 201, 204]:
-                                print(f" - Removed {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) from Trakt Watchlist ({item['IMDB_ID']})")
-                            else:
-                                error_message = f"Failed removing {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) from Trakt Watchlist ({item['IMDB_ID']})"
-                                print(f"   - {error_message}")
-                                EL.logger.error(error_message)
+                        season_number = item.get('SeasonNumber')
+                        episode_number = item.get('EpisodeNumber')
+                        if season_number and episode_number:
+                            season_number = str(season_number).zfill(2)
+                            episode_number = str(episode_number).zfill(2)
+                            episode_title = f'[S{season_number}E{episode_number}] '
+                        else:
+                            episode_title = ''
+                                                    
+                        if success:
+                            print(f" - Removed {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) from Trakt Watchlist ({item['IMDB_ID']})")
+                        else:
+                            error_message = f"Failed removing {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) from Trakt Watchlist ({item['IMDB_ID']})"
+                            print(f"   - {error_message}")
+                            EL.logger.error(error_message)
+                    
+                    print(f" - Trakt Watchlist: {traktBulk.format_response_counts(response_counts)}")
 
                     print('Removing Watched Items From Trakt Watchlist Complete')
                 else:
@@ -1011,6 +925,7 @@ def main():
                 # Remove Watched Items IMDB Watchlist
                 if imdb_watchlist_items_to_remove:
                     print('Removing Watched Items From IMDB Watchlist')
+                    imdbData.record_imdb_write('watchlist')
                     
                     # Count the total number of items
                     num_items = len(imdb_watchlist_items_to_remove)
@@ -1106,79 +1021,33 @@ def main():
                 if trakt_watch_history_to_set:
                     print('Setting Trakt Watch History')
 
-                    # Set the API endpoint for syncing watch history
-                    watch_history_url = "https://api.trakt.tv/sync/history"
-                    
                     # Count the total number of items
                     num_items = len(trakt_watch_history_to_set)
                     item_count = 0
+                    response_counts = {}
                     
-                    # Loop through your data table and set watch history for each item
-                    for item in trakt_watch_history_to_set:
+                    # Add watch history in chunks, each item keeps its own watched_at
+                    for item, success in traktBulk.submit_watch_history(trakt_watch_history_to_set, chunk_size=traktBulk.HISTORY_CHUNK_SIZE, max_payload_bytes=traktBulk.HISTORY_MAX_PAYLOAD_BYTES, counts=response_counts):
                         item_count += 1
                         
-                        # Initialize the data variable for the current item
-                        data = None
-                        
-                        if item["Type"] == "movie":
-                            # This is a movie
-                            data = {
-                                "movies": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    },
-                                    "watched_at": item["WatchedAt"]  # Mark when the movie was watched
-                                }]
-                            }
-                        
-                        elif item["Type"] == "episode":
-                        
-                            # This is an episode                                
-                            data = {
-                                "episodes": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    },
-                                    "watched_at": item["WatchedAt"]  # Mark when the episode was watched
-                                }]
-                            }
+                        season_number = item.get('SeasonNumber')
+                        episode_number = item.get('EpisodeNumber')
+                        if season_number and episode_number:
+                            season_number = str(season_number).zfill(2)
+                            episode_number = str(episode_number).zfill(2)
+                            episode_title = f'[S{season_number}E{episode_number}] '
+                        else:
+                            episode_title = ''
                         
-                        '''
-                        # Skip adding shows, because it will mark all episodes as watched
-                        elif item["Type"] == "show":
-                            # This is an episode
-                            data = {
-                                "shows": [{
-                                    "ids": {
-                                        "imdb": item["IMDB_ID"]
-                                    },
-                                    "watched_at": item["WatchedAt"]  # Mark when the episode was watched
-                                }]
-                            }
-                        '''
+                        if success:
+                            print(f" - Adding {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watch History ({item['IMDB_ID']})")
                         
-                        if data:
-                            # Make the API call to mark the item as watched
-                            response = EH.make_trakt_request(watch_history_url, payload=data)
-                            
-                            season_number = item.get('SeasonNumber')
-                            episode_number = item.get('EpisodeNumber')
-                            if season_number and episode_number:
-                                season_number = str(season_number).zfill(2)
-                                episode_number = str(episode_number).zfill(2)
-                                episode_title = f'[S{season_number}E{episode_number}] '
-                            else:
-                                episode_title = ''
-                            
-                            year_str = f' ({item["Year"]})' if item["Year"] is not None else '' # sometimes year is None for episodes from trakt so remove it from the print string
-                            
-                            if response and response.status_code in [200, 201, 204]:
-                                print(f" - Adding {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watch History ({item['IMDB_ID']})")
-                            
-                            else:
-                                error_message = f"Failed to add {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watch History ({item['IMDB_ID']})"
-                                print(f"   - {error_message}")
-                                EL.logger.error(error_message)
+                        else:
+                            error_message = f"Failed to add {item['Type']} ({item_count} of {num_items}): {episode_title}{item['Title']} ({item['Year']}) to Trakt Watch History ({item['IMDB_ID']})"
+                            print(f"   - {error_message}")
+                            EL.logger.error(error_message)
+                    
+                    print(f" - Trakt Watch History: {traktBulk.format_response_counts(response_counts)}")
 
                     print('Setting Trakt Watch History Complete')
                 else:
@@ -1187,6 +1056,7 @@ def main():
                 # Set IMDB Watch History Items
                 if imdb_watch_history_to_set:
                     print('Setting IMDB Watch History Items')
+                    imdbData.record_imdb_write('check-ins')
                     
                     # Count the total number of items
                     num_items = len(imdb_watch_history_to_set)
@@ -1328,6 +1198,13 @@ def main():
                 driver.quit()
             if 'service' in locals() and service is not None:
                 service.stop()
+        
+        finally:
+            # Stop the background token refresh and close pooled HTTP connections
+            VC.cancel_token_refresh()
+            EH.close_http_session()
+            # Record how often requests waited for a Trakt rate limit slot
+            EL.logger.info(f"Trakt rate limiter state: {RL.get_rate_limiter_state()}")
 
 if __name__ == '__main__':
     main()
@@ -151,7 +151,7 @@ def clear_user_data(main_directory):
 
 def clear_cache(main_directory):
     """
-    Deletes all folders, .zip files, .txt files (except credentials.txt) in the given directory and clears selenium chromedriver cache.
+    Deletes all folders (including the Trakt HTTP cache), .zip files, .txt files (except credentials.txt) in the given directory and clears selenium chromedriver cache.
     
     :param main_directory: Directory path where data should be cleared.
     """
@@ -160,6 +160,11 @@ def clear_cache(main_directory):
         print(f"Error: The directory {main_directory} does not exist.")
         return
     
+    # Clear stored Trakt HTTP responses and their ETag / Last-Modified validators
+    http_cache_directory = os.path.join(main_directory, "cache", "http")
+    if os.path.exists(http_cache_directory):
+        try_remove(http_cache_directory)
+    
     # Walk through all files and folders in the directory
     for root, dirs, files in os.walk(main_directory, topdown=False):
         # Delete files first
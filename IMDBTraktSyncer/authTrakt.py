@@ -6,7 +6,14 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from IMDBTraktSyncer import errorHandling as EH
 from IMDBTraktSyncer import errorLogger as EL
 
-def authenticate(client_id, client_secret, refresh_token=None):
+def authenticate(client_id, client_secret, refresh_token=None, interactive=True):
+    """
+    Gets a new Trakt access token, using the refresh token if one is given and otherwise asking
+    the user to authorize the application.
+
+    With interactive set to False (e.g. from a background thread) the user is never prompted and
+    None is returned if the refresh token is rejected.
+    """
 
     redirect_uri = 'urn:ietf:wg:oauth:2.0:oob'
 
@@ -38,6 +45,9 @@ def authenticate(client_id, client_secret, refresh_token=None):
             
             return access_token, refresh_token, expiration_time
         else:
+            if not interactive:
+                # Leave re-authentication to the next foreground call
+                return None
             # empty response, invalid refresh token, prompt user to re-authenticate
             return authenticate(client_id, client_secret)
 
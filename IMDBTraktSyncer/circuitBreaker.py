@@ -0,0 +1,145 @@
+import time
+import threading
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from IMDBTraktSyncer import errorLogger as EL
+
+# Consecutive server errors (5xx, 52x, network errors) that open the Trakt circuit
+TRAKT_FAILURE_THRESHOLD = 5
+
+# Seconds the circuit stays open before a single probe request is let through.
+# Doubles after every failed probe, up to TRAKT_MAX_RESET_TIMEOUT.
+TRAKT_RESET_TIMEOUT = 30
+TRAKT_MAX_RESET_TIMEOUT = 300
+
+# Seconds between checks while another request is probing a half-open circuit
+HALF_OPEN_POLL_INTERVAL = 1
+
+# Retries make_trakt_request may spend before requests succeed again. Every successful request earns
+# TRAKT_RETRY_RATIO retries back, up to TRAKT_RETRY_BUDGET, so retries stay a fraction of all requests.
+TRAKT_RETRY_BUDGET = 100
+TRAKT_RETRY_RATIO = 0.2
+
+# Token requests bypass the circuit breaker and retry budget
+TRAKT_OAUTH_URL = 'https://api.trakt.tv/oauth/'
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker shared by all requests to one service.
+
+    closed: requests are sent normally.
+    open: requests fail immediately until reset_timeout has passed.
+    half_open: one probe request is sent, its result closes or re-opens the circuit.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold, reset_timeout, max_reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        Returns True if a request may be sent now. While open, returns False until the reset timeout
+        has passed, then lets exactly one probe request through.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self.opened_until:
+                self.state = self.HALF_OPEN
+                EL.logger.info(f"{self.name} circuit half-open, sending a probe request")
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                print(f" - {self.name} is responding again, resuming requests")
+                EL.logger.info(f"{self.name} circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                # Probe failed, stay open for longer
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == self.CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_until = time.monotonic() + self.reset_timeout
+        print(f" - {self.name} keeps returning server errors, pausing requests for {self.reset_timeout}s")
+        EL.logger.warning(f"{self.name} circuit opened for {self.reset_timeout}s after {self.failures} consecutive failures")
+
+    def is_open(self):
+        with self.lock:
+            return self.state != self.CLOSED
+
+    def wait_until_ready(self, timeout):
+        """
+        Sleeps until the circuit lets a probe request through, for at most timeout seconds.
+        """
+        with self.lock:
+            if self.state == self.OPEN:
+                delay = self.opened_until - time.monotonic()
+            elif self.state == self.HALF_OPEN:
+                # Another request is probing, check again shortly
+                delay = HALF_OPEN_POLL_INTERVAL
+            else:
+                delay = 0
+        delay = min(max(0.0, delay), max(0.0, timeout))
+        if delay:
+            time.sleep(delay)
+
+class RetryBudget:
+    """
+    Thread-safe token bucket of retries shared by all requests of a run. Starts with max_retries,
+    every successful request adds retry_ratio and every retry takes one.
+    """
+    def __init__(self, name, max_retries, retry_ratio):
+        self.name = name
+        self.max_retries = float(max_retries)
+        self.retry_ratio = retry_ratio
+        self.remaining = float(max_retries)
+        self.exhausted = False
+        self.lock = threading.Lock()
+
+    def record_success(self):
+        with self.lock:
+            self.remaining = min(self.max_retries, self.remaining + self.retry_ratio)
+            if self.exhausted and self.remaining >= 1:
+                self.exhausted = False
+                EL.logger.info(f"{self.name} retry budget refilled")
+
+    def try_consume(self):
+        """
+        Takes one retry from the budget. Returns False while the budget is used up.
+        """
+        with self.lock:
+            if self.remaining < 1:
+                if not self.exhausted:
+                    self.exhausted = True
+                    print(f" - {self.name} retry budget used up, failed requests are not retried until requests succeed again")
+                    EL.logger.warning(f"{self.name} retry budget used up")
+                return False
+            self.remaining -= 1
+            return True
+
+trakt_circuit_breaker = CircuitBreaker('Trakt', TRAKT_FAILURE_THRESHOLD, TRAKT_RESET_TIMEOUT, TRAKT_MAX_RESET_TIMEOUT)
+trakt_retry_budget = RetryBudget('Trakt', TRAKT_RETRY_BUDGET, TRAKT_RETRY_RATIO)
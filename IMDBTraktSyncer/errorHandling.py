@@ -1,10 +1,13 @@
 import traceback
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, RequestException, Timeout, TooManyRedirects, SSLError, ProxyError
 import time
+import threading
 import os
 import inspect
 import json
+import codecs
 import re
 from datetime import datetime, timedelta
 from selenium.common.exceptions import WebDriverException, TimeoutException
@@ -13,10 +16,74 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from IMDBTraktSyncer import verifyCredentials as VC
 from IMDBTraktSyncer import errorLogger as EL
+from IMDBTraktSyncer import rateLimiter as RL
+from IMDBTraktSyncer import httpCache as HC
+from IMDBTraktSyncer import circuitBreaker as CB
 
 class PageLoadException(Exception):
     pass
 
+# Bytes read from the socket at a time when decoding a streamed JSON response
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Shared HTTP session settings
+# pool_connections: number of hosts to keep connection pools for
+# pool_maxsize: number of keep-alive connections kept open per host
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 10
+HTTP_KEEP_ALIVE = True
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session(pool_connections=None, pool_maxsize=None, keep_alive=None):
+    """
+    Returns the shared, pooled HTTP session used for all Trakt and download requests.
+    The session is created on first use so every request in a run reuses the same
+    TCP/TLS connections instead of doing a new handshake per call.
+
+    Args:
+        pool_connections (int): Number of host pools to cache. Defaults to HTTP_POOL_CONNECTIONS.
+        pool_maxsize (int): Maximum keep-alive connections per host. Defaults to HTTP_POOL_MAXSIZE.
+        keep_alive (bool): Keep connections open between requests. Defaults to HTTP_KEEP_ALIVE.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _http_session
+    
+    with _http_session_lock:
+        if _http_session is None:
+            pool_connections = HTTP_POOL_CONNECTIONS if pool_connections is None else pool_connections
+            pool_maxsize = HTTP_POOL_MAXSIZE if pool_maxsize is None else pool_maxsize
+            keep_alive = HTTP_KEEP_ALIVE if keep_alive is None else keep_alive
+            
+            session = requests.Session()
+            # Retries are handled by make_trakt_request and make_request_with_retries
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if not keep_alive:
+                session.headers['Connection'] = 'close'
+            
+            _http_session = session
+        
+        return _http_session
+
+def close_http_session():
+    """
+    Closes the shared HTTP session and all pooled connections. Safe to call more than once.
+    """
+    global _http_session
+    
+    with _http_session_lock:
+        if _http_session is not None:
+            try:
+                _http_session.close()
+            except Exception as e:
+                EL.logger.warning(f"Error closing HTTP session: {e}")
+            _http_session = None
+
 def report_error(error_message):
     github_issue_url = "https://github.com/RileyXX/IMDB-Trakt-Syncer/issues/new?template=bug_report.yml"
     traceback_info = traceback.format_exc()
@@ -30,49 +97,103 @@ def report_error(error_message):
     print(f"Submit the error here: {github_issue_url}")
     print("-" * 50)
 
-def make_trakt_request(url, headers=None, params=None, payload=None, max_retries=5):
+def make_trakt_request(url, headers=None, params=None, payload=None, max_retries=5, use_cache=False, stream=False):
 
     # Set default headers if none are provided
     if headers is None:
-        # Get credentials
-        trakt_client_id, _, trakt_access_token, _, _, _ = VC.prompt_get_credentials()
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'trakt-api-version': '2',
-            'trakt-api-key': trakt_client_id,
-            'Authorization': f'Bearer {trakt_access_token}'
-        }
+        # Get cached credentials headers
+        headers = VC.get_trakt_headers()
+    
+    # Revalidate a stored GET response with If-None-Match / If-Modified-Since
+    cache_key = cached_entry = None
+    if use_cache and payload is None:
+        cache_key = HC.get_cache_key(url, params, headers)
+        cached_entry = HC.load_entry(cache_key)
+        if cached_entry:
+            headers = {**headers, **HC.get_conditional_headers(cached_entry)}
     
     retry_delay = 1  # Initial delay between retries (in seconds)
     retry_attempts = 0  # Count of retry attempts made
     connection_timeout = 20  # Timeout for requests (in seconds)
     total_wait_time = sum(1 * (2 ** i) for i in range(max_retries))  # Total possible wait time
 
+    session = get_http_session()
+    method = "GET" if payload is None else "POST"
+    
+    # Token requests are never short-circuited, authenticate() would take a request that was not sent
+    # for a rejected refresh token and ask the user to authorize again
+    use_breaker = not url.startswith(CB.TRAKT_OAUTH_URL)
+    
+    def stop_retrying():
+        # Give up right away while Trakt is down or once the shared retry budget is spent
+        if not use_breaker:
+            return False
+        return CB.trakt_circuit_breaker.is_open() or not CB.trakt_retry_budget.try_consume()
+
     # Retry loop to handle network errors or server overload scenarios
     while retry_attempts < max_retries:
         response = None
         try:
+            # Fail fast while Trakt keeps returning server errors
+            if use_breaker and not CB.trakt_circuit_breaker.allow_request():
+                EL.logger.warning(f"Trakt circuit open, request not sent. URL: {url}")
+                return None
+            
+            # Wait for a free slot in the shared Trakt rate limit budget
+            RL.wait_for_trakt_slot(method)
+            
             # Send GET or POST request depending on whether a payload is provided
             if payload is None:
                 if params:
                     # GET request with query parameters
-                    response = requests.get(url, headers=headers, params=params, timeout=connection_timeout)
+                    response = session.get(url, headers=headers, params=params, timeout=connection_timeout, stream=stream)
                 else:
                     # GET request without query parameters
-                    response = requests.get(url, headers=headers, timeout=connection_timeout)
+                    response = session.get(url, headers=headers, timeout=connection_timeout, stream=stream)
             else:
                 # POST request with JSON payload
-                response = requests.post(url, headers=headers, json=payload, timeout=connection_timeout)
+                response = session.post(url, headers=headers, json=payload, timeout=connection_timeout)
             
             if response is not None:
+                # Learn the current rate limits from the response headers
+                RL.update_from_trakt_response(method, response)
+                
+                if use_breaker:
+                    if response.status_code in [500, 502, 503, 504, 520, 521, 522]:
+                        CB.trakt_circuit_breaker.record_failure()
+                    else:
+                        CB.trakt_circuit_breaker.record_success()
+                        CB.trakt_retry_budget.record_success()
+                
+                if stream and response.status_code not in [200, 201, 204]:
+                    # Read the body of unsuccessful streamed responses so the connection returns to the pool
+                    response.content
+                
                 # If request is successful, return the response
                 if response.status_code in [200, 201, 204]:
+                    if cache_key and response.status_code == 200:
+                        if stream:
+                            # The body is written to the cache while iter_json_array() reads it
+                            response.cache_key = cache_key
+                        else:
+                            HC.store_response(cache_key, url, response)
                     return response
                 
+                # Stored response is still current, return it without downloading the body again
+                elif response.status_code == 304 and cached_entry:
+                    cached_response = HC.load_response(cache_key)
+                    if cached_response is not None:
+                        return cached_response
+                    # Entry was evicted in the meantime, request the full response
+                    headers = {key: value for key, value in headers.items() if key not in ['If-None-Match', 'If-Modified-Since']}
+                    cached_entry = None
+                
                 # Handle retryable server errors and rate limit exceeded
                 elif response.status_code in [429, 500, 502, 503, 504, 520, 521, 522]:
                     retry_attempts += 1  # Increment retry counter
+                    if response.status_code != 429 and stop_retrying():
+                        EL.logger.error(f"Server returned {response.status_code}, not retrying. URL: {url}")
+                        return None
 
                     # Respect the 'Retry-After' header if provided, otherwise use default delay
                     retry_after = int(response.headers.get('Retry-After', retry_delay))
@@ -96,6 +217,10 @@ def make_trakt_request(url, headers=None, params=None, payload=None, max_retries
             else:
                 # Failsafe in case response is still None for any unexpected reason
                 retry_attempts += 1
+                if use_breaker:
+                    CB.trakt_circuit_breaker.record_failure()
+                if stop_retrying():
+                    return None
                 print(f" - No response received. Retrying... ({retry_attempts}/{max_retries})")
                 EL.logger.warning(f"No response received. Retrying... ({retry_attempts}/{max_retries})")
                 time.sleep(retry_delay)
@@ -104,6 +229,11 @@ def make_trakt_request(url, headers=None, params=None, payload=None, max_retries
         # Handle Network errors (connection issues, timeouts, SSL, etc.)
         except (ConnectionError, Timeout, TooManyRedirects, SSLError, ProxyError) as network_error:
             retry_attempts += 1  # Increment retry counter
+            if use_breaker:
+                CB.trakt_circuit_breaker.record_failure()
+            if stop_retrying():
+                EL.logger.error(f"Network error: {network_error}, not retrying. URL: {url}")
+                return None
             remaining_time = sum(1 * (2 ** i) for i in range(retry_attempts, max_retries))
             print(f" - Network error: {network_error}. Retrying ({retry_attempts}/{max_retries})... "
                   f"Time remaining: {remaining_time}s")
@@ -115,6 +245,8 @@ def make_trakt_request(url, headers=None, params=None, payload=None, max_retries
 
         # Handle general request-related exceptions (non-retryable)
         except requests.exceptions.RequestException as req_err:
+            if use_breaker:
+                CB.trakt_circuit_breaker.record_failure()
             error_message = f"Request failed with exception: {req_err}"
             print(f" - {error_message}")
             EL.logger.error(error_message, exc_info=True)
@@ -126,6 +258,91 @@ def make_trakt_request(url, headers=None, params=None, payload=None, max_retries
     EL.logger.error(error_message)
     return None
 
+def iter_json_array(response, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    """
+    Decodes a JSON array response one element at a time while it is downloaded, so only the current
+    chunk and element are held in memory instead of the whole body and parse tree.
+    Use with make_trakt_request(..., stream=True).
+
+    Args:
+        response: A streamed requests.Response or an httpCache.CachedResponse.
+        chunk_size (int): Bytes read from the response at a time.
+
+    Yields:
+        The decoded array elements, in order.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    cache_key = getattr(response, 'cache_key', None)
+    if cache_key:
+        chunks = HC.iter_and_store_response(cache_key, response.url, response, chunk_size)
+    else:
+        chunks = response.iter_content(chunk_size=chunk_size)
+
+    buffer = ''
+    position = 0
+    finished = False
+
+    def read_more():
+        nonlocal buffer, position, finished
+        # Drop the already decoded part of the buffer before appending the next chunk
+        buffer = buffer[position:]
+        position = 0
+        for chunk in chunks:
+            text = text_decoder.decode(chunk)
+            if text:
+                buffer += text
+                return
+        buffer += text_decoder.decode(b'', final=True)
+        finished = True
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer) or finished:
+                return
+            read_more()
+
+    try:
+        skip_whitespace()
+        if buffer[position:position + 1] != '[':
+            raise ValueError(f"Expected a JSON array. URL: {response.url}")
+        position += 1
+
+        while True:
+            skip_whitespace()
+            if buffer[position:position + 1] == ']':
+                # Read any remaining bytes so the body is complete for the cache and the connection can be reused
+                for _ in chunks:
+                    pass
+                return
+            if buffer[position:position + 1] == ',':
+                position += 1
+                skip_whitespace()
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if finished:
+                    raise
+                read_more()
+                continue
+            # Numbers split between chunks decode as a shorter number, so only accept an element once
+            # the following ',' or ']' has arrived
+            delimiter = end
+            while delimiter < len(buffer) and buffer[delimiter] in ' \t\r\n':
+                delimiter += 1
+            if delimiter == len(buffer) or buffer[delimiter] not in ',]':
+                if finished:
+                    raise ValueError(f"Invalid JSON array. URL: {response.url}")
+                read_more()
+                continue
+            position = end
+            yield element
+    finally:
+        response.close()
+
 def get_trakt_message(status_code):
     error_messages = {
         200: "Success",
@@ -291,7 +508,7 @@ def get_page_with_retries(url, driver, wait, total_wait_time=180, initial_wait_t
     print("   - All retries failed. Unable to load page.")
     return False, status_code, url, driver, wait
     
-def make_request_with_retries(url, method="GET", headers=None, params=None, payload=None, max_retries=5, timeout=(30, 300), stream=False):
+def make_request_with_retries(url, method="GET", headers=None, params=None, payload=None, max_retries=5, timeout=(30, 300), stream=False, cookies=None):
     """
     Make an HTTP request with retry logic for handling server and connection errors.
 
@@ -304,6 +521,7 @@ def make_request_with_retries(url, method="GET", headers=None, params=None, payl
         max_retries (int): Maximum number of retries. Default is 5.
         timeout (tuple): Tuple of (connect timeout, read timeout). Default is (30, 300).
         stream (bool): Whether to stream the response. Default is False.
+        cookies (dict): Optional cookies sent with this request only.
 
     Returns:
         requests.Response: The HTTP response object if successful.
@@ -311,14 +529,15 @@ def make_request_with_retries(url, method="GET", headers=None, params=None, payl
     """
     retry_delay = 1  # Initial delay between retries (seconds)
     retry_attempts = 0
+    session = get_http_session()
 
     while retry_attempts < max_retries:
         try:
             # Make the HTTP request based on the method
             if method.upper() == "GET":
-                response = requests.get(url, headers=headers, params=params, timeout=timeout, stream=stream)
+                response = session.get(url, headers=headers, params=params, timeout=timeout, stream=stream, cookies=cookies)
             elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+                response = session.post(url, headers=headers, json=payload, timeout=timeout, stream=stream, cookies=cookies)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
 
@@ -0,0 +1,234 @@
+import os
+import json
+import hashlib
+import threading
+import time
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from IMDBTraktSyncer import errorLogger as EL
+
+# Maximum total size of stored response bodies, least recently used entries are removed first
+HTTP_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Response headers stored with the body and returned again on a 304
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'X-Pagination-Page', 'X-Pagination-Limit', 'X-Pagination-Page-Count', 'X-Pagination-Item-Count']
+
+_cache_lock = threading.Lock()
+
+class CachedResponse:
+    """
+    Stands in for a requests.Response when a stored body is reused after a 304 Not Modified.
+    """
+    def __init__(self, url, headers, body_path):
+        self.url = url
+        self.status_code = 200
+        self.headers = headers
+        self.body_path = body_path
+        self.from_cache = True
+
+    @property
+    def content(self):
+        with open(self.body_path, 'rb') as f:
+            return f.read()
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        with open(self.body_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def close(self):
+        pass
+
+def get_cache_directory():
+    """
+    Returns the directory used to store data between runs, creating it if needed.
+    """
+    directory = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def read_json_file(file_path, default=None):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def write_json_file(file_path, data):
+    # Write to a temporary file first so an interrupted run never leaves a half written file
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(temp_path, file_path)
+
+def get_http_cache_directory():
+    """
+    Returns the directory used to store HTTP response bodies, creating it if needed.
+    """
+    directory = os.path.join(get_cache_directory(), 'http')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def get_cache_key(url, params=None, headers=None):
+    """
+    Returns the cache key of a GET request. The Authorization header is left out, so entries survive
+    token refreshes. Cached Trakt endpoints carry the username in the URL, and the trakt-api-key
+    header keeps responses of different API apps apart.
+    """
+    api_key = (headers or {}).get('trakt-api-key')
+    key_data = json.dumps([url, sorted((params or {}).items()), api_key], default=str)
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+def get_entry_paths(key):
+    directory = get_http_cache_directory()
+    return os.path.join(directory, f'{key}.body'), os.path.join(directory, f'{key}.json')
+
+def load_entry(key):
+    """
+    Returns the stored metadata of a cache entry, or None if it is missing or incomplete.
+    """
+    body_path, meta_path = get_entry_paths(key)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(body_path):
+        return None
+    return meta
+
+def get_conditional_headers(meta):
+    """
+    Returns the If-None-Match / If-Modified-Since headers for a stored entry.
+    """
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+def load_response(key):
+    """
+    Returns the stored response of a cache entry as a CachedResponse and marks it as recently used,
+    or None if the entry is gone.
+    """
+    meta = load_entry(key)
+    if meta is None:
+        return None
+    body_path, meta_path = get_entry_paths(key)
+    try:
+        # The modification time of the body is used as last access time for eviction
+        os.utime(body_path, None)
+    except OSError:
+        return None
+    return CachedResponse(meta.get('url'), meta.get('headers', {}), body_path)
+
+def get_entry_meta(url, response):
+    """
+    Returns the metadata stored for a response, or None if it has no ETag or Last-Modified header
+    and therefore cannot be revalidated.
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return None
+    return {
+        'url': url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'headers': {header: response.headers[header] for header in STORED_HEADERS if header in response.headers},
+        'stored_at': time.time()
+    }
+
+def commit_entry(key, meta):
+    """
+    Moves a fully written '<key>.body.tmp' into place together with its metadata.
+    """
+    body_path, meta_path = get_entry_paths(key)
+    with _cache_lock:
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(body_path + '.tmp', body_path)
+        os.replace(meta_path + '.tmp', meta_path)
+    evict_entries()
+
+def store_response(key, url, response):
+    """
+    Stores the body and validators of a successful GET response.
+    """
+    meta = get_entry_meta(url, response)
+    if meta is None:
+        return
+    body_path, meta_path = get_entry_paths(key)
+    try:
+        # Write to temporary files first so an interrupted run never leaves a partial entry
+        with open(body_path + '.tmp', 'wb') as f:
+            f.write(response.content)
+        commit_entry(key, meta)
+    except OSError as e:
+        EL.logger.warning(f"Unable to store HTTP response in cache: {e}")
+
+def iter_and_store_response(key, url, response, chunk_size):
+    """
+    Yields the body of a streamed GET response chunk by chunk while writing it to the cache.
+    The entry is only stored once the whole body was read.
+    """
+    meta = get_entry_meta(url, response)
+    if meta is None:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    body_path, meta_path = get_entry_paths(key)
+    try:
+        body_file = open(body_path + '.tmp', 'wb')
+    except OSError as e:
+        EL.logger.warning(f"Unable to store HTTP response in cache: {e}")
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    with body_file:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            body_file.write(chunk)
+            yield chunk
+    try:
+        commit_entry(key, meta)
+    except OSError as e:
+        EL.logger.warning(f"Unable to store HTTP response in cache: {e}")
+
+def evict_entries(max_bytes=HTTP_CACHE_MAX_BYTES):
+    """
+    Removes the least recently used entries until the stored bodies fit within max_bytes.
+    """
+    with _cache_lock:
+        directory = get_http_cache_directory()
+        entries = []
+        total_bytes = 0
+        for file_name in os.listdir(directory):
+            if not file_name.endswith('.body'):
+                continue
+            try:
+                stat = os.stat(os.path.join(directory, file_name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_name[:-len('.body')]))
+            total_bytes += stat.st_size
+
+        for _, size, key in sorted(entries):
+            if total_bytes <= max_bytes:
+                break
+            for path in get_entry_paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_bytes -= size
@@ -3,6 +3,8 @@ import time
 import csv
 import traceback
 from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.support import expected_conditions as EC
@@ -11,99 +13,277 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from IMDBTraktSyncer import errorHandling as EH
 from IMDBTraktSyncer import errorLogger as EL
+from IMDBTraktSyncer import httpCache as HC
 
 class PageLoadException(Exception):
     pass
 
+# Number of Trakt media type lookups run in the background while reviews are scraped
+MEDIA_TYPE_LOOKUP_WORKERS = 4
+
+# Exports generated by an earlier run are reused for this many hours, unless the list was changed
+# on IMDB by this script since. Set to 0 to always generate new exports.
+EXPORT_REUSE_MAX_AGE_HOURS = 6
+
+# List pages with the export button of each export entry name
+EXPORT_PAGES = {
+    'watchlist': 'https://www.imdb.com/list/watchlist',
+    'ratings': 'https://www.imdb.com/list/ratings',
+    'check-ins': 'https://www.imdb.com/list/checkins'
+}
+
+# Seconds between checks of the IMDB exports page, starting at the initial interval and growing
+# by EXPORT_POLL_BACKOFF after every check up to the maximum interval
+EXPORT_POLL_INITIAL_INTERVAL = 0.5
+EXPORT_POLL_MAX_INTERVAL = 10
+EXPORT_POLL_BACKOFF = 1.5
+
+# Maximum seconds to wait for IMDB to finish processing the exports
+EXPORT_MAX_WAIT = 1200
+
+# Number of IMDB export files downloaded at the same time
+EXPORT_DOWNLOAD_WORKERS = 3
+
+# Bytes written at a time when downloading an IMDB export
+EXPORT_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Final names of the export files, never mistaken for a new Chrome download
+EXPORT_FILE_NAMES = ('watchlist.csv', 'ratings.csv', 'checkins.csv')
+
+# Maximum seconds to wait for a Chrome download of an export to finish
+EXPORT_DOWNLOAD_TIMEOUT = 600
+
+# Seconds between checks of the download directory
+DOWNLOAD_POLL_INTERVAL = 0.1
+
+# Maximum seconds to wait for an export button click to open its download URL
+EXPORT_URL_CAPTURE_TIMEOUT = 5
+
+def get_export_statuses(driver):
+    """
+    Returns the lowercased text of every entry on the loaded IMDB exports page, newest first,
+    in a single script evaluation.
+    """
+    return driver.execute_script("""
+        return Array.from(document.querySelectorAll('.ipc-metadata-list-summary-item'), item => item.innerText.toLowerCase());
+    """) or []
+
+def exports_ready(item_texts, export_names):
+    """
+    Returns True if the newest export entry of each name in export_names (e.g. "watchlist") is no
+    longer in progress. Names without any entry are treated as ready.
+    """
+    for name in export_names:
+        newest = next((text for text in item_texts if name in text), None)
+        if newest is not None and "in progress" in newest:
+            return False
+    return True
+
+def wait_for_exports(driver, wait, export_names, max_wait_time=EXPORT_MAX_WAIT):
+    """
+    Waits for IMDB to finish processing the requested exports.
+    The exports page is loaded once and then refreshed in the same tab, checking all statuses in one
+    script evaluation with an adaptive interval, so small exports are picked up within seconds.
+
+    Args:
+        export_names (list): Export entry names to wait for, e.g. ["watchlist", "ratings", "check-ins"].
+        max_wait_time (float): Maximum seconds to wait.
+
+    Returns:
+        tuple: (driver, wait)
+
+    Raises:
+        TimeoutError: If the exports are still in progress after max_wait_time seconds.
+    """
+    success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/exports/', driver, wait)
+    if not success:
+        # Page failed to load, raise an exception
+        raise PageLoadException(f"Failed to load page. Status code: {status_code}. URL: {url}")
+
+    try:
+        wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".ipc-metadata-list-summary-item")))
+    except TimeoutException:
+        print("No items found when attempting to generate IMDB exports. Assuming no IMDB watchlist, ratings or check-ins to download.")
+        return driver, wait
+
+    deadline = time.monotonic() + max_wait_time
+    interval = EXPORT_POLL_INITIAL_INTERVAL
+    while True:
+        item_texts = get_export_statuses(driver)
+        # An empty list means the refreshed page has not rendered its entries yet
+        if item_texts and exports_ready(item_texts, export_names):
+            return driver, wait
+        if time.monotonic() + interval > deadline:
+            raise TimeoutError(f"IMDB data processing did not complete within the allotted {max_wait_time} seconds.")
+        time.sleep(interval)
+        interval = min(interval * EXPORT_POLL_BACKOFF, EXPORT_POLL_MAX_INTERVAL)
+        driver.refresh()
+
+def get_export_state_path():
+    return os.path.join(HC.get_cache_directory(), 'imdb_exports.json')
+
+def record_imdb_write(export_name):
+    """
+    Records that this script is about to change an IMDB list, so exports generated before now are no
+    longer reused. export_name is an EXPORT_PAGES key, e.g. "watchlist".
+    """
+    export_state = HC.read_json_file(get_export_state_path(), default={})
+    export_state.setdefault('writes', {})[export_name] = time.time()
+    try:
+        HC.write_json_file(get_export_state_path(), export_state)
+    except OSError as e:
+        EL.logger.warning(f"Unable to store IMDB write time: {e}")
+
+def record_exports_generated(generated_at):
+    """
+    Stores when each export in generated_at ({export name: timestamp}) was requested.
+    """
+    export_state = HC.read_json_file(get_export_state_path(), default={})
+    export_state.setdefault('generated', {}).update(generated_at)
+    try:
+        HC.write_json_file(get_export_state_path(), export_state)
+    except OSError as e:
+        EL.logger.warning(f"Unable to store IMDB export times: {e}")
+
+def get_reusable_exports(driver, wait, export_names, max_age_hours=EXPORT_REUSE_MAX_AGE_HOURS):
+    """
+    Returns the export names whose latest export can be downloaded again instead of generating a new one.
+    An export is reused when it was requested less than max_age_hours ago, after the last change this
+    script made to that IMDB list, and its newest entry on the exports page is ready.
+
+    Returns:
+        tuple: (reusable export names, driver, wait)
+    """
+    export_state = HC.read_json_file(get_export_state_path(), default={})
+    generated = export_state.get('generated', {})
+    writes = export_state.get('writes', {})
+    now = time.time()
+    candidates = [
+        name for name in export_names
+        if now - generated.get(name, 0) < max_age_hours * 3600 and generated.get(name, 0) > writes.get(name, 0)
+    ]
+    if not candidates:
+        return [], driver, wait
+
+    # Confirm the exports still exist and finished processing
+    success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/exports/', driver, wait)
+    if not success:
+        raise PageLoadException(f"Failed to load page. Status code: {status_code}. URL: {url}")
+    try:
+        wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".ipc-metadata-list-summary-item")))
+    except TimeoutException:
+        return [], driver, wait
+    item_texts = get_export_statuses(driver)
+
+    reusable = []
+    for name in candidates:
+        newest = next((text for text in item_texts if name in text), None)
+        if newest is not None and "in progress" not in newest:
+            reusable.append(name)
+    return reusable, driver, wait
+
+def open_tabs(driver, urls):
+    """
+    Opens each url in a new tab of the WebDriver without waiting for it to load, so the pages load in parallel.
+
+    Returns:
+        list: The window handles of the new tabs, in the order of urls.
+    """
+    tabs = []
+    for url in urls:
+        existing_tabs = set(driver.window_handles)
+        driver.execute_script("window.open(arguments[0], '_blank');", url)
+        tabs.append(next(handle for handle in driver.window_handles if handle not in existing_tabs))
+    return tabs
+
+def get_tab_status_code(driver, wait):
+    """
+    Returns the HTTP status code of the page in the current tab once it is available, or None.
+    """
+    try:
+        wait.until(lambda driver: driver.execute_script(
+            "return window.performance.getEntries().length > 0 && window.performance.getEntries()[0].responseStatus !== undefined"
+        ))
+        return driver.execute_script("return window.performance.getEntries()[0].responseStatus;")
+    except TimeoutException:
+        return None
+
+def click_export_button(driver, wait):
+    """
+    Clicks the export button of the list page in the current tab.
+
+    Returns:
+        float: The time the export was requested, or None if the page has no export button.
+    """
+    try:
+        export_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-testid*='hero-list-subnav-export-button'] button")))
+        # Scroll into view and click the button
+        driver.execute_script("arguments[0].scrollIntoView(true);", export_button)
+        wait.until(EC.visibility_of(export_button))
+        requested_at = time.time()
+        driver.execute_script("arguments[0].click();", export_button)
+        return requested_at
+    except TimeoutException:
+        # print("Export button not found, possibly because the list is empty.")
+        return None
+
 def generate_imdb_exports(driver, wait, directory, sync_watchlist_value, sync_ratings_value, sync_watch_history_value, remove_watched_from_watchlists_value, mark_rated_as_watched_value):
     # Generate IMDB .csv exports
-  
-    # Generate watchlist export if sync_watchlist_value is True
+    export_names = []
     if sync_watchlist_value or remove_watched_from_watchlists_value:
-        success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/list/watchlist', driver, wait)
-        if not success:
-            # Page failed to load, raise an exception
-            raise PageLoadException(f"Failed to load page. Status code: {status_code}. URL: {url}")
-
-        try:
-            export_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-testid*='hero-list-subnav-export-button'] button")))
-            # Scroll into view and click the button
-            driver.execute_script("arguments[0].scrollIntoView(true);", export_button)
-            wait.until(EC.visibility_of(export_button))
-            driver.execute_script("arguments[0].click();", export_button)
-            time.sleep(3)
-        except TimeoutException:
-            # print("Export button not found, possibly because the list is empty.")
-            pass
-    
-    # Generate ratings export if sync_ratings_value is True
+        export_names.append("watchlist")
     if sync_ratings_value or mark_rated_as_watched_value:
-        success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/list/ratings', driver, wait)
-        if not success:
-            # Page failed to load, raise an exception
-            raise PageLoadException(f"Failed to load page. Status code: {status_code}. URL: {url}")
-        try:
-            export_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-testid*='hero-list-subnav-export-button'] button")))
-            # Scroll into view and click the button
-            driver.execute_script("arguments[0].scrollIntoView(true);", export_button)
-            wait.until(EC.visibility_of(export_button))
-            driver.execute_script("arguments[0].click();", export_button)
-            time.sleep(3)
-        except TimeoutException:
-            # print("Export button not found, possibly because the list is empty.")
-            pass
-    
-    # Generate checkins export if sync_watch_history_value is True
+        export_names.append("ratings")
     if sync_watch_history_value or remove_watched_from_watchlists_value or mark_rated_as_watched_value:
-        success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/list/checkins', driver, wait)
-        if not success:
-            # Page failed to load, raise an exception
-            raise PageLoadException(f"Failed to load page. Status code: {status_code}. URL: {url}")
+        export_names.append("check-ins")
 
-        try:
-            export_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-testid*='hero-list-subnav-export-button'] button")))
-            driver.execute_script("arguments[0].scrollIntoView(true);", export_button)
-            wait.until(EC.visibility_of(export_button))
-            driver.execute_script("arguments[0].click();", export_button)
+    # Skip exports that are still fresh from an earlier run
+    reusable, driver, wait = get_reusable_exports(driver, wait, export_names)
+    for name in reusable:
+        print(f" - Reusing recent IMDB {name} export")
+    export_names = [name for name in export_names if name not in reusable]
+
+    # Load the list pages in parallel tabs and click all export buttons before waiting once
+    generated_at = {}
+    failed_pages = []
+    if export_names:
+        original_tab = driver.current_window_handle
+        export_tabs = open_tabs(driver, [EXPORT_PAGES[name] for name in export_names])
+        for name, tab in zip(export_names, export_tabs):
+            driver.switch_to.window(tab)
+            status_code = get_tab_status_code(driver, wait)
+            if not status_code or status_code >= 400:
+                failed_pages.append(name)
+                continue
+            requested_at = click_export_button(driver, wait)
+            if requested_at:
+                generated_at[name] = requested_at
+        if generated_at:
+            # Give the export requests time to be sent before their tabs are closed
             time.sleep(3)
-        except TimeoutException:
-            # print("Export button not found, possibly because the list is empty.")
-            pass
-    
-    # Wait for export processing to finish
-    # Function to check if any summary item contains "in progress"
-    def check_in_progress(summary_items):
-        for item in summary_items:
-            if "in progress" in item.text.lower():
-                return True
-        return False
-    # Maximum time to wait in seconds
-    max_wait_time = 1200
-    start_time = time.time()
+        for tab in export_tabs:
+            driver.switch_to.window(tab)
+            driver.close()
+        driver.switch_to.window(original_tab)
 
-    while time.time() - start_time < max_wait_time:
-        # Wait for export processing to finish
-        success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/exports/', driver, wait)
+    # Pages that failed to load in a tab are loaded again one at a time with retries
+    for name in failed_pages:
+        success, status_code, url, driver, wait = EH.get_page_with_retries(EXPORT_PAGES[name], driver, wait)
         if not success:
             # Page failed to load, raise an exception
             raise PageLoadException(f"Failed to load page. Status code: {status_code}. URL: {url}")
-        
-        try:
-            # Locate all elements with the selector
-            summary_items = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".ipc-metadata-list-summary-item")))
-        except TimeoutException:
-            print("No items found when attempting to generate IMDB exports. Assuming no IMDB watchlist, ratings or check-ins to download.")
-            break
-
-        # Check if any summary item contains "in progress"
-        if not check_in_progress(summary_items):
-            #print("No 'in progress' found. Proceeding.")
-            break
-        else:
-            #print("'In progress' found. Waiting for 30 seconds before retrying.")
-            time.sleep(30)
-    else:
-        raise TimeoutError("IMDB data processing did not complete within the allotted 20 minutes.")
+        requested_at = click_export_button(driver, wait)
+        if requested_at:
+            generated_at[name] = requested_at
+            time.sleep(3)
+    if generated_at:
+        record_exports_generated(generated_at)
+
+    if not export_names:
+        return driver, wait
+
+    # Wait for export processing to finish
+    driver, wait = wait_for_exports(driver, wait, export_names)
     
     return driver, wait
     
@@ -123,9 +303,156 @@ def grant_permissions_and_rename_file(src_path, dest_name):
     except Exception as e:
         print(f"Error while renaming file {src_path} to {dest_name}: {e}")
         
+def get_export_download_url(driver, button):
+    """
+    Returns the link behind an export download button on the IMDB exports page, or None if the
+    download can only be started by clicking it.
+    """
+    return driver.execute_script("""
+        const button = arguments[0];
+        const link = button.closest('a[href]') || button.querySelector('a[href]');
+        const href = link ? link.href : (button.getAttribute('href') || button.getAttribute('data-href'));
+        return href && !href.startsWith('javascript:') ? new URL(href, document.baseURI).href : null;
+    """, button)
+
+def capture_export_download_url(driver, button, timeout=EXPORT_URL_CAPTURE_TIMEOUT):
+    """
+    Clicks an export download button with window.open() and link clicks intercepted, and returns the
+    http(s) URL the page tried to open instead of letting Chrome download it. blob: and data: links
+    are let through, those can only be downloaded by Chrome.
+
+    Returns:
+        str: The download URL, or None if the click did not open an http(s) URL within timeout seconds.
+    """
+    driver.execute_script("""
+        const button = arguments[0];
+        window.__exportDownloadUrl = null;
+        const capture = url => {
+            const href = new URL(url, document.baseURI).href;
+            if (!/^https?:/.test(href)) return false;
+            window.__exportDownloadUrl = href;
+            return true;
+        };
+        const originalOpen = window.open;
+        const originalClick = HTMLAnchorElement.prototype.click;
+        const onClick = event => {
+            const link = event.target.closest && event.target.closest('a[href]');
+            if (link && link !== button && capture(link.href)) event.preventDefault();
+        };
+        window.open = function(url, ...args) {
+            return url && capture(url) ? null : originalOpen.call(window, url, ...args);
+        };
+        HTMLAnchorElement.prototype.click = function() {
+            if (this.href && capture(this.href)) return;
+            return originalClick.call(this);
+        };
+        document.addEventListener('click', onClick, true);
+        window.__restoreExportDownloadHooks = () => {
+            window.open = originalOpen;
+            HTMLAnchorElement.prototype.click = originalClick;
+            document.removeEventListener('click', onClick, true);
+        };
+        button.scrollIntoView(true);
+        button.click();
+    """, button)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            download_url = driver.execute_script("return window.__exportDownloadUrl || null;")
+            if download_url or time.monotonic() >= deadline:
+                return download_url
+            time.sleep(DOWNLOAD_POLL_INTERVAL)
+    finally:
+        driver.execute_script("if (window.__restoreExportDownloadHooks) window.__restoreExportDownloadHooks();")
+
+def download_started(directory, existing_files):
+    """
+    Returns True if a new .csv or .crdownload file appeared in directory since existing_files was listed.
+    """
+    return any((f.endswith('.csv') or f.endswith('.crdownload')) and f not in existing_files and f not in EXPORT_FILE_NAMES for f in os.listdir(directory))
+
+def download_export_file(url, file_path, cookies, user_agent):
+    """
+    Downloads an IMDB export straight to file_path with the shared HTTP session.
+    The WebDriver's IMDB cookies are only sent to imdb.com hosts, never to the storage host of a signed URL.
+
+    Returns:
+        bool: True if the file was downloaded.
+    """
+    host = urlparse(url).hostname or ''
+    is_imdb_host = host == 'imdb.com' or host.endswith('.imdb.com')
+    headers = {'User-Agent': user_agent, 'Referer': 'https://www.imdb.com/exports/'}
+    response = EH.make_request_with_retries(url, headers=headers, stream=True, cookies=cookies if is_imdb_host else None)
+    if response is None:
+        return False
+    try:
+        # Write to a temporary file first so a failed download never leaves a partial .csv behind
+        with open(file_path + '.tmp', 'wb') as f:
+            for chunk in response.iter_content(chunk_size=EXPORT_DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(file_path + '.tmp', file_path)
+        os.chmod(file_path, 0o777)
+        return True
+    except Exception as e:
+        EL.logger.warning(f"Failed to download IMDB export to {file_path}: {e}", exc_info=True)
+        return False
+    finally:
+        response.close()
+
+def wait_for_download(directory, existing_files, timeout=EXPORT_DOWNLOAD_TIMEOUT):
+    """
+    Waits for Chrome to finish downloading a new .csv file into directory.
+    Chrome writes downloads to '.crdownload' partials and only renames them to their final name once
+    they are complete, so the download is done when a new .csv exists and no partial is left.
+
+    Args:
+        directory (str): The Chrome download directory.
+        existing_files (set): File names present in directory before the download was started.
+        timeout (float): Maximum seconds to wait.
+
+    Returns:
+        str: Path of the downloaded file.
+
+    Raises:
+        TimeoutError: If no complete download appeared within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        file_names = os.listdir(directory)
+        # Partials left behind by an earlier aborted download are ignored
+        partials = [f for f in file_names if f.endswith('.crdownload') and f not in existing_files]
+        new_files = [f for f in file_names if f.endswith('.csv') and f not in existing_files and f not in EXPORT_FILE_NAMES]
+        if new_files and not partials:
+            return os.path.join(directory, new_files[0])
+        if time.monotonic() >= deadline:
+            state = f"{len(partials)} partial download(s) still in progress" if partials else "no download was started"
+            raise TimeoutError(f"Chrome download did not finish within {timeout} seconds, {state} in {directory}")
+        time.sleep(DOWNLOAD_POLL_INTERVAL)
+
+def click_export_download(driver, wait, directory, csv_link, file_name):
+    """
+    Downloads an IMDB export by clicking its button in Chrome and renames the downloaded file to file_name.
+    """
+    try:
+        existing_files = set(os.listdir(directory))
+        driver.execute_script("arguments[0].scrollIntoView(true);", csv_link)
+        wait.until(EC.visibility_of(csv_link))
+        driver.execute_script("arguments[0].click();", csv_link)
+        downloaded_file = wait_for_download(directory, existing_files)
+        grant_permissions_and_rename_file(downloaded_file, file_name)
+    except TimeoutError as e:
+        print(f"Unable to locate downloaded file for {file_name}: {str(e)}")
+        EL.logger.error(f"Download of IMDB export '{file_name}' timed out: {str(e)}")
+    except Exception as e:
+        print(f"Failed to download or rename file '{file_name}': {str(e)}")
+
 def download_imdb_exports(driver, wait, directory, sync_watchlist_value, sync_ratings_value, sync_watch_history_value, remove_watched_from_watchlists_value, mark_rated_as_watched_value):
     """
     Download IMDB Exports and rename files with correct permissions.
+
+    Exports with a download link are fetched concurrently with the shared HTTP session, using the
+    WebDriver's cookies and user agent, straight to their final file names. Exports without a link,
+    or whose direct download fails, are downloaded by clicking their button in Chrome.
     """
     # Load page
     success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/exports/', driver, wait)
@@ -158,9 +485,9 @@ def download_imdb_exports(driver, wait, directory, sync_watchlist_value, sync_ra
     ratings_csv_link = find_button("ratings") if sync_ratings_value or mark_rated_as_watched_value else None
     checkins_csv_link = find_button("check-ins") if sync_watch_history_value or remove_watched_from_watchlists_value or mark_rated_as_watched_value else None
 
-    # Clear any previous csv files
+    # Clear any previous csv files and partial downloads
     for file in os.listdir(directory):
-        if file.endswith('.csv'):
+        if file.endswith('.csv') or file.endswith('.crdownload'):
             os.remove(os.path.join(directory, file))
 
     # Download each file and rename accordingly
@@ -170,28 +497,59 @@ def download_imdb_exports(driver, wait, directory, sync_watchlist_value, sync_ra
         (checkins_csv_link, "checkins.csv")
     ]
     
+    # Collect the download links while the exports page is open, the WebDriver is only used from this thread
+    cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
+    user_agent = driver.execute_script("return navigator.userAgent;")
+    direct_downloads = []
+    click_downloads = []
     for csv_link, file_name in file_mappings:
-        if csv_link:
+        if not csv_link:
+            print(f"No export button found for '{file_name}', skipping...")
+            continue
+        try:
+            download_url = get_export_download_url(driver, csv_link)
+        except Exception as e:
+            EL.logger.warning(f"Unable to read download link for '{file_name}': {e}")
+            download_url = None
+        if download_url:
+            EL.logger.info(f"Downloading IMDB export '{file_name}' from its page link")
+            direct_downloads.append((csv_link, file_name, download_url))
+            continue
+
+        # The button has no link, read the URL its click opens instead
+        existing_files = set(os.listdir(directory))
+        try:
+            download_url = capture_export_download_url(driver, csv_link)
+        except Exception as e:
+            EL.logger.warning(f"Unable to capture download URL for '{file_name}': {e}")
+            download_url = None
+        if download_url:
+            EL.logger.info(f"Downloading IMDB export '{file_name}' from the URL opened by its button")
+            direct_downloads.append((csv_link, file_name, download_url))
+        elif download_started(directory, existing_files):
+            # The click started a Chrome download the hooks could not intercept, let it finish
+            EL.logger.info(f"IMDB export '{file_name}' is downloaded by Chrome, no download URL could be captured")
             try:
-                driver.execute_script("arguments[0].scrollIntoView(true);", csv_link)
-                wait.until(EC.visibility_of(csv_link))
-                driver.execute_script("arguments[0].click();", csv_link)
-                time.sleep(10)  # wait for download to complete
-
-                downloaded_files = sorted(
-                    [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.csv')],
-                    key=os.path.getmtime,
-                    reverse=True
-                )
-
-                if downloaded_files:
-                    grant_permissions_and_rename_file(downloaded_files[0], file_name)
-                else:
-                    print(f"Unable to locate downloaded file for {file_name}")
-            except Exception as e:
-                print(f"Failed to download or rename file '{file_name}': {str(e)}")
+                grant_permissions_and_rename_file(wait_for_download(directory, existing_files), file_name)
+            except TimeoutError as e:
+                print(f"Unable to locate downloaded file for {file_name}: {str(e)}")
+                EL.logger.error(f"Download of IMDB export '{file_name}' timed out: {str(e)}")
         else:
-            print(f"No export button found for '{file_name}', skipping...")
+            EL.logger.info(f"No download URL found for IMDB export '{file_name}', downloading it by clicking in Chrome")
+            click_downloads.append((csv_link, file_name))
+
+    with ThreadPoolExecutor(max_workers=EXPORT_DOWNLOAD_WORKERS) as executor:
+        futures = [(csv_link, file_name, executor.submit(download_export_file, download_url, os.path.join(directory, file_name), cookies, user_agent)) for csv_link, file_name, download_url in direct_downloads]
+
+        # Click the exports without a link while the direct downloads run
+        for csv_link, file_name in click_downloads:
+            click_export_download(driver, wait, directory, csv_link, file_name)
+
+        for csv_link, file_name, future in futures:
+            if not future.result():
+                print(f"Direct download of '{file_name}' failed, downloading it through Chrome instead")
+                EL.logger.info(f"Direct download of IMDB export '{file_name}' failed, downloading it by clicking in Chrome")
+                click_export_download(driver, wait, directory, csv_link, file_name)
 
     return driver, wait
 
@@ -438,9 +796,28 @@ def get_media_type(imdb_id):
             return media_type
     return None
 
+def get_media_type_cache_path():
+    return os.path.join(HC.get_cache_directory(), 'imdb_media_types.json')
+
+def resolve_media_type(imdb_id):
+    """
+    Runs get_media_type() in a background worker, returning None instead of raising.
+    """
+    try:
+        return get_media_type(imdb_id)
+    except Exception as e:
+        EL.logger.warning(f"Unable to get media type for {imdb_id}: {e}")
+        return None
+
 def get_imdb_reviews(driver, wait, directory):
     #Get IMDB Reviews
     
+    # Media types never change, so IMDB_ID -> type lookups are stored between runs.
+    # Unknown IDs are looked up on Trakt in the background while the review pages are scraped.
+    media_type_cache = HC.read_json_file(get_media_type_cache_path(), default={})
+    media_type_lookups = {}
+    media_type_executor = ThreadPoolExecutor(max_workers=MEDIA_TYPE_LOOKUP_WORKERS)
+    
     # Load page
     success, status_code, url, driver, wait = EH.get_page_with_retries('https://www.imdb.com/profile', driver, wait)
     if not success:
@@ -483,12 +860,10 @@ def get_imdb_reviews(driver, wait, directory):
                     review['Comment'] = element.find_element(By.CSS_SELECTOR, "div[data-testid='review-overflow']").text.strip()
                     spoiler_warning_elements = element.find_elements(By.CSS_SELECTOR, ".review-spoiler-button")
                     review['Spoiler'] = len(spoiler_warning_elements) > 0
-                    # Get the media type using Trakt API
-                    media_type = get_media_type(review['IMDB_ID'])
-                    if media_type:
-                        review['Type'] = media_type
-                    else:
-                        review['Type'] = 'unknown'
+                    # Get the media type from the cache, or start a Trakt API lookup in the background
+                    imdb_id = review['IMDB_ID']
+                    if imdb_id not in media_type_cache and imdb_id not in media_type_lookups:
+                        media_type_lookups[imdb_id] = media_type_executor.submit(resolve_media_type, imdb_id)
 
                     # if review['Type'] != 'unknown':
                     reviews.append(review)
@@ -541,6 +916,21 @@ def get_imdb_reviews(driver, wait, directory):
         traceback.print_exc()
         EL.logger.error(error_message, exc_info=True)
     
+    # Wait for the remaining media type lookups and store the new results
+    for imdb_id, future in media_type_lookups.items():
+        media_type = future.result()
+        if media_type:
+            media_type_cache[imdb_id] = media_type
+    media_type_executor.shutdown()
+    if media_type_lookups:
+        try:
+            HC.write_json_file(get_media_type_cache_path(), media_type_cache)
+        except OSError as e:
+            EL.logger.warning(f"Unable to store IMDB media types: {e}")
+    
+    for review in reviews:
+        review['Type'] = media_type_cache.get(review['IMDB_ID']) or 'unknown'
+    
     # Filter out duplicate reviews for the same item based on ID
     filtered_reviews = []
     seen = set()
@@ -0,0 +1,157 @@
+import json
+import time
+import threading
+from datetime import datetime, timezone
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Holds up to capacity tokens and refills at capacity / period tokens per second.
+    """
+    def __init__(self, name, capacity, period):
+        self.name = name
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled_waits = 0
+        self.throttled_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        rate = self.capacity / self.period
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """
+        Takes one token, sleeping until one is available.
+        """
+        waited = False
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    delay = (1 - self.tokens) * self.period / self.capacity
+                if not waited:
+                    self.throttled_waits += 1
+                    waited = True
+                self.throttled_seconds += delay
+            time.sleep(delay)
+
+    def update(self, limit=None, period=None, remaining=None, until=None):
+        """
+        Adjusts the bucket to the limits reported by the server.
+
+        Args:
+            limit (int): Requests allowed per period.
+            period (int): Period length in seconds.
+            remaining (int): Requests left in the current period.
+            until (float): time.monotonic() value when the period resets. Only used when remaining is 0.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            if limit and period:
+                self.capacity = float(limit)
+                self.period = float(period)
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+                if remaining <= 0 and until:
+                    self.blocked_until = max(self.blocked_until, until)
+
+    def block_for(self, seconds):
+        """
+        Empties the bucket and blocks it for the given number of seconds (e.g. after a 429 Retry-After).
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def get_state(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return {
+                'name': self.name,
+                'limit': self.capacity,
+                'period': self.period,
+                'tokens': round(self.tokens, 2),
+                'blocked_for': round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                'throttled_waits': self.throttled_waits,
+                'throttled_seconds': round(self.throttled_seconds, 2)
+            }
+
+# Trakt defaults, see https://trakt.docs.apiary.io/#introduction/rate-limiting
+# GET: 1000 calls every 5 minutes. POST, PUT, DELETE: 1 call per second.
+trakt_buckets = {
+    'GET': TokenBucket('GET', 1000, 300),
+    'POST': TokenBucket('POST', 1, 1)
+}
+
+def get_bucket(method):
+    return trakt_buckets['GET' if method.upper() == 'GET' else 'POST']
+
+def wait_for_trakt_slot(method):
+    """
+    Blocks until a Trakt request of the given HTTP method may be sent without exceeding the rate limit.
+    """
+    get_bucket(method).acquire()
+
+def parse_until(until):
+    """
+    Converts an ISO 8601 'until' timestamp into a time.monotonic() deadline.
+    """
+    try:
+        until_time = datetime.fromisoformat(until.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if until_time.tzinfo is None:
+        until_time = until_time.replace(tzinfo=timezone.utc)
+    seconds = (until_time - datetime.now(timezone.utc)).total_seconds()
+    return time.monotonic() + max(0.0, seconds)
+
+def update_from_trakt_response(method, response):
+    """
+    Learns the current limits from a Trakt response and pauses the matching bucket after a 429.
+
+    Trakt reports limits in the X-Ratelimit header, e.g.
+    {"name": "AUTHED_API_GET_LIMIT", "period": 300, "limit": 1000, "remaining": 20, "until": "2020-10-10T00:24:00Z"}
+    """
+    bucket = get_bucket(method)
+    header = response.headers.get('X-Ratelimit')
+    if header:
+        try:
+            rate_limit = json.loads(header)
+            bucket.update(
+                limit=rate_limit.get('limit'),
+                period=rate_limit.get('period'),
+                remaining=rate_limit.get('remaining'),
+                until=parse_until(rate_limit.get('until'))
+            )
+        except (ValueError, TypeError, AttributeError):
+            pass
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get('Retry-After', 1))
+        except ValueError:
+            retry_after = 1
+        bucket.block_for(retry_after)
+
+def get_rate_limiter_state():
+    """
+    Returns the current state and throttling counters of the Trakt GET and POST buckets.
+    """
+    return {method: bucket.get_state() for method, bucket in trakt_buckets.items()}
+
+def get_throttled_waits():
+    """
+    Returns the total number of requests that had to wait for a rate limit slot.
+    """
+    return sum(bucket.get_state()['throttled_waits'] for bucket in trakt_buckets.values())
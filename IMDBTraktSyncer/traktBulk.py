@@ -0,0 +1,263 @@
+import json
+import time
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from IMDBTraktSyncer import errorHandling as EH
+from IMDBTraktSyncer import errorLogger as EL
+from IMDBTraktSyncer import circuitBreaker as CB
+
+# Maps item 'Type' values to the Trakt sync payload keys
+TYPE_KEYS = {
+    'movie': 'movies',
+    'show': 'shows',
+    'episode': 'episodes'
+}
+
+# Number of items sent per /sync request
+WATCHLIST_CHUNK_SIZE = 100
+RATINGS_CHUNK_SIZE = 100
+HISTORY_CHUNK_SIZE = 250
+WATCHLIST_REMOVE_CHUNK_SIZE = 100
+
+# Maximum approximate request body size for /sync/history
+HISTORY_MAX_PAYLOAD_BYTES = 64 * 1024
+
+# Maximum seconds to wait for Trakt to recover before deferred chunks are given up
+DEFERRED_CHUNKS_MAX_WAIT = 600
+
+def chunk_items(items, chunk_size, max_payload_bytes=None, item_size=None):
+    """
+    Splits a list of items into consecutive chunks.
+
+    Args:
+        items (list): Items to split.
+        chunk_size (int): Maximum number of items per chunk.
+        max_payload_bytes (int): Optional maximum summed item_size() per chunk.
+        item_size (callable): Function returning the payload size in bytes of an item.
+
+    Yields:
+        list: The next chunk of items.
+    """
+    chunk_size = max(1, int(chunk_size))
+    chunk = []
+    chunk_bytes = 0
+    for item in items:
+        size = item_size(item) if max_payload_bytes and item_size else 0
+        if chunk and (len(chunk) >= chunk_size or (max_payload_bytes and chunk_bytes + size > max_payload_bytes)):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(item)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+def build_sync_entry(item, build_entry=None):
+    """
+    Builds the payload entry for one item, e.g. {"ids": {"imdb": "tt0000001"}, "rating": 8}.
+    """
+    entry = {
+        "ids": {
+            "imdb": item['IMDB_ID']
+        }
+    }
+    if build_entry:
+        entry.update(build_entry(item))
+    return entry
+
+def build_sync_payload(items, build_entry=None):
+    """
+    Builds a Trakt /sync payload with items grouped into movies, shows and episodes by IMDB_ID.
+
+    Args:
+        items (list): Items with 'Type' and 'IMDB_ID' keys.
+        build_entry (callable): Optional function returning extra fields (e.g. rating) for an item.
+
+    Returns:
+        dict: The payload, e.g. {"movies": [{"ids": {"imdb": "tt0000001"}}], "shows": [...]}.
+    """
+    payload = {}
+    for item in items:
+        payload.setdefault(TYPE_KEYS[item['Type']], []).append(build_sync_entry(item, build_entry))
+    return payload
+
+def get_not_found_ids(json_data):
+    """
+    Returns the (type key, IMDB_ID) pairs listed in the 'not_found' section of a Trakt /sync response.
+    """
+    not_found = set()
+    not_found_section = json_data.get('not_found') or {}
+    for type_key, entries in not_found_section.items():
+        if not isinstance(entries, list):
+            continue
+        for entry in entries:
+            imdb_id = (entry.get('ids') or {}).get('imdb')
+            if imdb_id:
+                not_found.add((type_key, imdb_id))
+    return not_found
+
+def add_response_counts(counts, json_data):
+    """
+    Adds the per-type numbers of the 'added', 'existing', 'deleted' and 'updated' sections of a
+    Trakt /sync response to counts, e.g. counts['added'] += json_data['added']['movies'].
+    """
+    for section in ['added', 'existing', 'deleted', 'updated']:
+        section_counts = json_data.get(section)
+        if isinstance(section_counts, dict):
+            for value in section_counts.values():
+                if isinstance(value, int):
+                    counts[section] = counts.get(section, 0) + value
+
+def format_response_counts(counts):
+    """
+    Formats summed response counts for printing, e.g. "12 added, 3 existing, 1 not found".
+    """
+    parts = [f"{counts[section]} {section.replace('_', ' ')}" for section in ['added', 'existing', 'deleted', 'updated', 'unchanged', 'not_found', 'failed'] if counts.get(section)]
+    return ", ".join(parts) if parts else "no changes"
+
+def reconcile_response_counts(chunk, json_data, section, not_found):
+    """
+    Compares the number of unique items in a chunk with the items Trakt reported in the given
+    response section (e.g. 'deleted') plus 'not_found'.
+
+    Returns:
+        int: Number of items Trakt neither counted in section nor listed as not found.
+    """
+    expected = len({(TYPE_KEYS[item['Type']], item['IMDB_ID']) for item in chunk})
+    section_counts = json_data.get(section) or {}
+    reported = sum(value for value in section_counts.values() if isinstance(value, int)) + len(not_found)
+    return max(0, expected - reported)
+
+def submit_sync_items(url, items, build_entry=None, chunk_size=WATCHLIST_CHUNK_SIZE, counts=None, max_payload_bytes=None, reconcile_section=None):
+    """
+    Sends items to a Trakt /sync endpoint in chunks instead of one request per item.
+    Items of unsupported types are skipped.
+
+    Args:
+        url (str): The Trakt /sync endpoint, e.g. "https://api.trakt.tv/sync/watchlist".
+        items (list): Items with 'Type' and 'IMDB_ID' keys.
+        build_entry (callable): Optional function returning extra payload fields for an item.
+        chunk_size (int): Maximum number of items per request.
+        counts (dict): Optional dict updated with the summed response counts of all chunks.
+        max_payload_bytes (int): Optional limit on the approximate JSON size of each request body.
+        reconcile_section (str): Optional response section (e.g. 'deleted') to reconcile against
+            each chunk. Unaccounted items are added to counts['unchanged'] and logged.
+
+    Yields:
+        tuple: (item, success) for each submitted item, in input order. success is False when the
+        chunk request failed or Trakt listed the item under 'not_found'.
+        Chunks that fail while the Trakt circuit breaker is open are deferred and retried (and
+        yielded) after the other chunks, once Trakt responds again.
+    """
+    items = [item for item in items if item.get('Type') in TYPE_KEYS]
+    if counts is None:
+        counts = {}
+
+    def entry_size(item):
+        # Serialized entry plus separator overhead
+        return len(json.dumps(build_sync_entry(item, build_entry))) + 2
+
+    # Leave room for the {"movies": [...], "shows": [...], "episodes": [...]} envelope
+    max_entry_bytes = max(1, max_payload_bytes - 64) if max_payload_bytes else None
+
+    def process_response(chunk, response):
+        if response and response.status_code in [200, 201, 204]:
+            try:
+                json_data = json.loads(response.text) if response.text else {}
+            except ValueError:
+                json_data = {}
+                EL.logger.warning(f"Unable to parse Trakt response body. URL: {url}")
+            add_response_counts(counts, json_data)
+            not_found = get_not_found_ids(json_data)
+            if reconcile_section:
+                unchanged = reconcile_response_counts(chunk, json_data, reconcile_section, not_found)
+                if unchanged:
+                    counts['unchanged'] = counts.get('unchanged', 0) + unchanged
+                    EL.logger.warning(f"Trakt reported {unchanged} of {len(chunk)} items as neither {reconcile_section} nor not found. URL: {url}")
+            for item in chunk:
+                success = (TYPE_KEYS[item['Type']], item['IMDB_ID']) not in not_found
+                if not success:
+                    counts['not_found'] = counts.get('not_found', 0) + 1
+                yield item, success
+        else:
+            counts['failed'] = counts.get('failed', 0) + len(chunk)
+            for item in chunk:
+                yield item, False
+
+    deferred_chunks = []
+    for chunk in chunk_items(items, chunk_size, max_payload_bytes=max_entry_bytes, item_size=entry_size):
+        response = EH.make_trakt_request(url, payload=build_sync_payload(chunk, build_entry))
+        if response is None and CB.trakt_circuit_breaker.is_open():
+            # Trakt is down, queue the chunk instead of failing it and the remaining chunks
+            deferred_chunks.append(chunk)
+            continue
+        yield from process_response(chunk, response)
+
+    if deferred_chunks:
+        deferred_items = sum(len(chunk) for chunk in deferred_chunks)
+        print(f" - Retrying {deferred_items} deferred items once Trakt responds again")
+        deadline = time.monotonic() + DEFERRED_CHUNKS_MAX_WAIT
+        for chunk in deferred_chunks:
+            while True:
+                CB.trakt_circuit_breaker.wait_until_ready(deadline - time.monotonic())
+                response = EH.make_trakt_request(url, payload=build_sync_payload(chunk, build_entry))
+                # Keep the chunk queued while the probe requests fail, until the deadline
+                if response is None and CB.trakt_circuit_breaker.is_open() and time.monotonic() < deadline:
+                    continue
+                break
+            yield from process_response(chunk, response)
+
+def submit_ratings(items, chunk_size=RATINGS_CHUNK_SIZE, counts=None):
+    """
+    Rates items on Trakt in chunks. Each payload groups the chunk into movies, shows and episodes
+    with their individual 'Rating' values.
+
+    Args:
+        items (list): Items with 'Type', 'IMDB_ID' and 'Rating' keys.
+        chunk_size (int): Maximum number of items per request.
+        counts (dict): Optional dict updated with the summed response counts.
+
+    Yields:
+        tuple: (item, success) for each submitted item, see submit_sync_items().
+    """
+    def build_rating_entry(item):
+        return {"rating": item['Rating']}
+
+    yield from submit_sync_items("https://api.trakt.tv/sync/ratings", items, build_entry=build_rating_entry, chunk_size=chunk_size, counts=counts)
+
+def submit_watch_history(items, chunk_size=HISTORY_CHUNK_SIZE, max_payload_bytes=HISTORY_MAX_PAYLOAD_BYTES, counts=None):
+    """
+    Adds movies and episodes to Trakt watch history in chunks, each with its own 'WatchedAt' value.
+    Shows are skipped, because adding a show marks all of its episodes as watched.
+
+    Args:
+        items (list): Items with 'Type', 'IMDB_ID' and 'WatchedAt' keys.
+        chunk_size (int): Maximum number of items per request.
+        max_payload_bytes (int): Maximum approximate JSON size of each request body.
+        counts (dict): Optional dict updated with the summed response counts.
+
+    Yields:
+        tuple: (item, success) for each submitted item, see submit_sync_items().
+    """
+    def build_history_entry(item):
+        return {"watched_at": item['WatchedAt']}
+
+    items = [item for item in items if item.get('Type') in ['movie', 'episode']]
+    yield from submit_sync_items("https://api.trakt.tv/sync/history", items, build_entry=build_history_entry, chunk_size=chunk_size, counts=counts, max_payload_bytes=max_payload_bytes)
+
+def submit_watchlist_removals(items, chunk_size=WATCHLIST_REMOVE_CHUNK_SIZE, counts=None):
+    """
+    Removes items from the Trakt watchlist in chunks and reconciles the 'deleted' and 'not_found'
+    counts of each response against the chunk. Items that were already absent from the watchlist
+    are counted as 'unchanged'.
+
+    Args:
+        items (list): Items with 'Type' and 'IMDB_ID' keys.
+        chunk_size (int): Maximum number of items per request.
+        counts (dict): Optional dict updated with the summed response counts.
+
+    Yields:
+        tuple: (item, success) for each submitted item, see submit_sync_items().
+    """
+    yield from submit_sync_items("https://api.trakt.tv/sync/watchlist/remove", items, chunk_size=chunk_size, counts=counts, reconcile_section='deleted')
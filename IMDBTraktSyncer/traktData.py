@@ -1,16 +1,180 @@
+import os
 import json
 import urllib.parse
 import datetime
+import time
+import requests
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from IMDBTraktSyncer import errorHandling as EH
 from IMDBTraktSyncer import errorLogger as EL
+from IMDBTraktSyncer import httpCache as HC
+from IMDBTraktSyncer import circuitBreaker as CB
+
+class TraktRequestException(Exception):
+    pass
+
+# Maximum number of history pages requested at the same time
+HISTORY_PAGES_IN_FLIGHT = 4
+
+# Stored Trakt data is re-downloaded after this many hours even if no activity changed
+SNAPSHOT_MAX_AGE_HOURS = 24
+
+# The full Trakt watch history is re-downloaded after this many days, otherwise only new plays are fetched
+HISTORY_FULL_REFRESH_DAYS = 7
+
+# Stored show status and aired episode counts are re-downloaded after this many hours
+SHOW_METADATA_MAX_AGE_HOURS = 72
+
+# When more shows than this need metadata, /sync/watched/shows is used instead of one request per show
+SHOW_METADATA_BULK_THRESHOLD = 50
+
+# Number of IMDB episode IDs looked up on Trakt at the same time
+EPISODE_LOOKUP_WORKERS = 4
+
+# Attempts to download a streamed Trakt response whose body fails part way through
+STREAM_READ_ATTEMPTS = 3
+
+# Order of record types in the lists returned by the get_trakt_* functions
+TYPE_ORDER = {'movie': 0, 'show': 1, 'episode': 2}
+
+# /sync/last_activities timestamps that change when each category changes
+ACTIVITY_KEYS = {
+    'watchlist': [('movies', 'watchlisted_at'), ('shows', 'watchlisted_at'), ('seasons', 'watchlisted_at'), ('episodes', 'watchlisted_at'), ('watchlist', 'updated_at')],
+    'ratings': [('movies', 'rated_at'), ('shows', 'rated_at'), ('seasons', 'rated_at'), ('episodes', 'rated_at')],
+    'comments': [('movies', 'commented_at'), ('shows', 'commented_at'), ('seasons', 'commented_at'), ('episodes', 'commented_at')],
+    'history': [('movies', 'watched_at'), ('episodes', 'watched_at')],
+    'watched': [('movies', 'watched_at'), ('episodes', 'watched_at')]
+}
 
 def remove_slashes(string):
     string = string.replace('/', '') if string is not None else None
     return string
 
+def read_streamed_records(iter_records, encoded_username):
+    """
+    Collects the records of a streamed Trakt response into a list. The body of a stream=True response is
+    read after make_trakt_request() returned, outside its retry loop, so a connection reset or read
+    timeout part way through is handled here: the partial records are discarded, the failure is
+    recorded with the circuit breaker and the request is sent again, drawing from the shared retry budget.
+
+    Args:
+        iter_records (callable): Generator function that sends the request and yields its records,
+            e.g. iter_trakt_watchlist.
+        encoded_username (str): The Trakt username passed to iter_records.
+
+    Returns:
+        list: All records of the response.
+    """
+    retry_delay = 1
+    for attempt in range(1, STREAM_READ_ATTEMPTS + 1):
+        try:
+            return list(iter_records(encoded_username))
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            CB.trakt_circuit_breaker.record_failure()
+            if attempt == STREAM_READ_ATTEMPTS or CB.trakt_circuit_breaker.is_open() or not CB.trakt_retry_budget.try_consume():
+                EL.logger.error(f"Trakt response was interrupted, not retrying: {e}")
+                raise TraktRequestException(f"Trakt response was interrupted while downloading: {e}")
+            print(f" - Trakt response was interrupted. Retrying ({attempt}/{STREAM_READ_ATTEMPTS - 1})...")
+            EL.logger.warning(f"Trakt response was interrupted: {e}. Retrying ({attempt}/{STREAM_READ_ATTEMPTS - 1})...")
+            time.sleep(retry_delay)
+            retry_delay *= 2
+
+def sort_by_type(records):
+    """
+    Returns records grouped as movies, shows, then episodes, keeping their order within each type.
+    """
+    return sorted(records, key=lambda record: TYPE_ORDER.get(record['Type'], len(TYPE_ORDER)))
+
+def fetch_trakt_pages(url, pages, params=None, max_workers=HISTORY_PAGES_IN_FLIGHT, use_cache=False):
+    """
+    Fetches pages of a paginated Trakt endpoint concurrently, with at most max_workers requests in flight.
+    Requests still go through make_trakt_request, so they share its rate limit budget.
+
+    Args:
+        url (str): The Trakt endpoint.
+        pages (iterable): Page numbers to fetch.
+        params (dict): Query parameters sent with every page.
+        max_workers (int): Maximum number of pages fetched at the same time.
+        use_cache (bool): Revalidate stored responses instead of downloading unchanged pages again.
+
+    Returns:
+        iterator: (page, response) tuples in page order, as soon as each page and all pages before it are done.
+        The first max_workers pages start downloading when this function is called, before the iterator
+        is consumed, and the next pages keep downloading while the caller processes the yielded one.
+    """
+    pages = list(pages)
+    max_workers = max(1, int(max_workers))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def fetch_page(page):
+        return EH.make_trakt_request(url, params={**(params or {}), 'page': page}, use_cache=use_cache)
+
+    # Keep a sliding window of pending pages so memory stays bounded
+    pending = []
+    next_index = 0
+
+    def fill_window():
+        nonlocal next_index
+        while next_index < len(pages) and len(pending) < max_workers:
+            page = pages[next_index]
+            pending.append((page, executor.submit(fetch_page, page)))
+            next_index += 1
+
+    def iter_pages():
+        try:
+            while pending:
+                page, future = pending.pop(0)
+                response = future.result()
+                fill_window()
+                yield page, response
+        finally:
+            # Pages not started yet are dropped if the caller stops early
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    fill_window()
+    return iter_pages()
+
+def paginate_trakt(url, params=None, prefetch=True, pages_in_flight=1, use_cache=False):
+    """
+    Iterates over all pages of a paginated Trakt endpoint. The page count is read from the
+    X-Pagination-Page-Count header of the first page, so no separate probe request is made.
+
+    Args:
+        url (str): The Trakt endpoint.
+        params (dict): Query parameters sent with every page, e.g. {'limit': 100}.
+        prefetch (bool): Download the next pages while the current page is processed.
+        pages_in_flight (int): Number of pages downloaded ahead when prefetch is enabled.
+        use_cache (bool): Revalidate stored responses instead of downloading unchanged pages again.
+
+    Yields:
+        list: The parsed JSON body of each page, in page order.
+    """
+    params = dict(params or {})
+
+    def parse_page(page, response):
+        if response is None:
+            raise TraktRequestException(f"Failed to get page {page} from Trakt. URL: {url}")
+        return json.loads(response.text)
+
+    response = EH.make_trakt_request(url, params={**params, 'page': 1}, use_cache=use_cache)
+    total_pages = int(response.headers.get('X-Pagination-Page-Count') or 1) if response is not None else 1
+    remaining_pages = range(2, total_pages + 1)
+    if prefetch:
+        # Start downloading the following pages before page 1 is handed to the caller
+        next_pages = fetch_trakt_pages(url, remaining_pages, params=params, max_workers=pages_in_flight, use_cache=use_cache)
+        yield parse_page(1, response)
+        for page, response in next_pages:
+            yield parse_page(page, response)
+    else:
+        yield parse_page(1, response)
+        for page in remaining_pages:
+            yield parse_page(page, EH.make_trakt_request(url, params={**params, 'page': page}, use_cache=use_cache))
+
 def get_trakt_encoded_username():
     # Process Trakt Ratings and Comments
     response = EH.make_trakt_request('https://api.trakt.tv/users/me')
@@ -19,26 +183,29 @@ def get_trakt_encoded_username():
     encoded_username = urllib.parse.quote(username_slug)
     return encoded_username
     
-def get_trakt_watchlist(encoded_username):
+def iter_trakt_watchlist(encoded_username):
+    """
+    Yields the Trakt watchlist items as normalized records while the response downloads.
+    """
     # Get Trakt Watchlist Items
-    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/watchlist?sort=added,asc')
-    json_data = json.loads(response.text)
+    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/watchlist?sort=added,asc', use_cache=True, stream=True)
+    if response is None:
+        raise TraktRequestException("Failed to get watchlist from Trakt.")
 
-    trakt_watchlist = []
-
-    for item in json_data:
+    # Decode the watchlist item by item while it downloads instead of loading the whole body
+    for item in EH.iter_json_array(response):
         if item['type'] == 'movie':
             movie = item.get('movie')
             imdb_movie_id = movie.get('ids', {}).get('imdb')
             imdb_movie_id = remove_slashes(imdb_movie_id)
             trakt_movie_id = movie.get('ids', {}).get('trakt')
-            trakt_watchlist.append({'Title': movie.get('title'), 'Year': movie.get('year'), 'IMDB_ID': imdb_movie_id, 'TraktID': trakt_movie_id, 'Date_Added': item.get('listed_at'), 'Type': 'movie'})
+            yield {'Title': movie.get('title'), 'Year': movie.get('year'), 'IMDB_ID': imdb_movie_id, 'TraktID': trakt_movie_id, 'Date_Added': item.get('listed_at'), 'Type': 'movie'}
         elif item['type'] == 'show':
             show = item.get('show')
             imdb_show_id = show.get('ids', {}).get('imdb')
             imdb_show_id = remove_slashes(imdb_show_id)
             trakt_show_id = show.get('ids', {}).get('trakt')
-            trakt_watchlist.append({'Title': show.get('title'), 'Year': show.get('year'), 'IMDB_ID': imdb_show_id, 'TraktID': trakt_show_id, 'Date_Added': item.get('listed_at'), 'Type': 'show'})
+            yield {'Title': show.get('title'), 'Year': show.get('year'), 'IMDB_ID': imdb_show_id, 'TraktID': trakt_show_id, 'Date_Added': item.get('listed_at'), 'Type': 'show'}
         elif item['type'] == 'episode':
             show = item.get('show')
             show_title = show.get('title')
@@ -47,30 +214,33 @@ def get_trakt_watchlist(encoded_username):
             imdb_episode_id = remove_slashes(imdb_episode_id)
             trakt_episode_id = episode.get('ids', {}).get('trakt')
             episode_title = f'{show_title}: {episode.get("title")}'
-            trakt_watchlist.append({'Title': episode_title, 'Year': episode.get('year'), 'IMDB_ID': imdb_episode_id, 'TraktID': trakt_episode_id, 'Date_Added': item.get('listed_at'), 'Type': 'episode'})
+            yield {'Title': episode_title, 'Year': episode.get('year'), 'IMDB_ID': imdb_episode_id, 'TraktID': trakt_episode_id, 'TraktShowID': show.get('ids', {}).get('trakt'), 'SeasonNumber': episode.get('season'), 'EpisodeNumber': episode.get('number'), 'Date_Added': item.get('listed_at'), 'Type': 'episode'}
+
+def get_trakt_watchlist(encoded_username):
+    trakt_watchlist = read_streamed_records(iter_trakt_watchlist, encoded_username)
     
     return trakt_watchlist
 
-def get_trakt_ratings(encoded_username):  
+def iter_trakt_ratings(encoded_username):
+    """
+    Yields the Trakt ratings as normalized records while the response downloads, newest first.
+    """
     # Get Trakt Ratings
-    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/ratings?sort=newest')
-    json_data = json.loads(response.text)
-
-    movie_ratings = []
-    show_ratings = []
-    episode_ratings = []
+    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/ratings?sort=newest', use_cache=True, stream=True)
+    if response is None:
+        raise TraktRequestException("Failed to get ratings from Trakt.")
 
-    for item in json_data:
+    for item in EH.iter_json_array(response):
         if item['type'] == 'movie':
             movie = item.get('movie')
             movie_id = movie.get('ids', {}).get('imdb')
             movie_id = remove_slashes(movie_id)
-            movie_ratings.append({'Title': movie.get('title'), 'Year': movie.get('year'), 'Rating': item.get('rating'), 'IMDB_ID': movie_id, 'Date_Added': item.get('rated_at'), 'WatchedAt': item.get('rated_at'), 'Type': 'movie'})
+            yield {'Title': movie.get('title'), 'Year': movie.get('year'), 'Rating': item.get('rating'), 'IMDB_ID': movie_id, 'Date_Added': item.get('rated_at'), 'WatchedAt': item.get('rated_at'), 'Type': 'movie'}
         elif item['type'] == 'show':
             show = item.get('show')
             show_id = show.get('ids', {}).get('imdb')
             show_id = remove_slashes(show_id)
-            show_ratings.append({'Title': show.get('title'), 'Year': show.get('year'), 'Rating': item.get('rating'), 'IMDB_ID': show_id, 'Date_Added': item.get('rated_at'), 'WatchedAt': item.get('rated_at'), 'Type': 'show'})
+            yield {'Title': show.get('title'), 'Year': show.get('year'), 'Rating': item.get('rating'), 'IMDB_ID': show_id, 'Date_Added': item.get('rated_at'), 'WatchedAt': item.get('rated_at'), 'Type': 'show'}
         elif item['type'] == 'episode':
             show = item.get('show')
             show_title = show.get('title')
@@ -78,23 +248,23 @@ def get_trakt_ratings(encoded_username):
             episode_id = episode.get('ids', {}).get('imdb')
             episode_id = remove_slashes(episode_id)
             episode_title = f'{show_title}: {episode.get("title")}'
-            episode_ratings.append({'Title': episode_title, 'Year': episode.get('year'), 'Rating': item.get('rating'), 'IMDB_ID': episode_id, 'Date_Added': item.get('rated_at'), 'WatchedAt': item.get('rated_at'), 'Type': 'episode'})
+            yield {'Title': episode_title, 'Year': episode.get('year'), 'Rating': item.get('rating'), 'IMDB_ID': episode_id, 'Date_Added': item.get('rated_at'), 'WatchedAt': item.get('rated_at'), 'Type': 'episode'}
 
-    trakt_ratings = movie_ratings + show_ratings + episode_ratings
+def get_trakt_ratings(encoded_username):
+    # Movie ratings first, then shows, then episodes
+    trakt_ratings = sort_by_type(read_streamed_records(iter_trakt_ratings, encoded_username))
     
     return trakt_ratings
 
-def get_trakt_comments(encoded_username):  
+def iter_trakt_comments(encoded_username):
+    """
+    Yields the Trakt comments as normalized records while the pages download.
+    Only the first comment of each item (by IMDB_ID) is yielded.
+    """
     # Get Trakt Comments
-    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/comments?sort=newest')
-    json_data = json.loads(response.text)
-    total_pages = response.headers.get('X-Pagination-Page-Count')
-    trakt_comments = []
-
-    for page in range(1, int(total_pages) + 1):
-        response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/comments', params={'page': page})
-        json_data = json.loads(response.text)
+    seen = set()
 
+    for json_data in paginate_trakt(f'https://api.trakt.tv/users/{encoded_username}/comments', use_cache=True):
         for comment in json_data:
             comment_type = comment['type']
             spoiler = comment.get('spoiler', False)
@@ -138,7 +308,12 @@ def get_trakt_comments(encoded_username):
             trakt_comment_id = comment_info.get('id')
             trakt_comment = comment_info.get('comment')
 
-            trakt_comments.append({
+            # Filter out duplicate comments for the same item based on ID
+            if show_movie_or_episode_imdb_id in seen:
+                continue
+            seen.add(show_movie_or_episode_imdb_id)
+
+            yield {
                 'Title': show_movie_or_episode_title,
                 'Year': show_movie_or_episode_year,
                 'IMDB_ID': show_movie_or_episode_imdb_id,
@@ -146,34 +321,34 @@ def get_trakt_comments(encoded_username):
                 'Comment': trakt_comment,
                 'Spoiler': spoiler,
                 'Type': comment_type
-            })
+            }
 
-    # Filter out duplicate comments for the same item based on ID
-    filtered_comments = []
-    seen = set()
-    for item in trakt_comments:
-        if item['IMDB_ID'] not in seen:
-            seen.add(item['IMDB_ID'])
-            filtered_comments.append(item)
-    trakt_comments = filtered_comments
+def get_trakt_comments(encoded_username):
+    trakt_comments = list(iter_trakt_comments(encoded_username))
     
     return trakt_comments
     
-def get_trakt_watch_history(encoded_username):  
-    # Get Trakt Watch History
-    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/history?limit=100')
-    json_data = json.loads(response.text)
-    total_pages = response.headers.get('X-Pagination-Page-Count')
-
-    watched_movies = []
-    watched_shows = []
-    watched_episodes = []
-    seen_ids = set()
+def iter_trakt_history_records(encoded_username, seen_ids, episode_counts, params=None, stats=None):
+    """
+    Downloads Trakt watch history pages and yields them as movie, show and episode records as the pages arrive.
+    Only the first (most recent) play of each Trakt ID is kept, using and updating seen_ids.
 
-    for page in range(1, int(total_pages) + 1):
-        response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/history?extended=full', params={'page': page, 'limit': 100})
-        json_data = json.loads(response.text)
+    Args:
+        encoded_username (str): The Trakt username.
+        seen_ids (set): Trakt IDs already processed.
+        episode_counts (dict): Number of watched episodes per Trakt show ID, updated while parsing.
+        params (dict): Extra query parameters, e.g. {'start_at': '2024-01-01T00:00:00.000Z'}.
+        stats (dict): Optional dict whose 'plays' value is increased by the number of plays downloaded.
 
+    Yields:
+        dict: The next movie, show or episode record.
+    """
+    # Fetch pages concurrently and process them in order so seen_ids keeps the most recent play
+    # Pages are requested without extended=full, show status and aired episodes come from get_show_metadata()
+    # Only full downloads are revalidated, start_at requests differ on every run
+    for json_data in paginate_trakt(f'https://api.trakt.tv/users/{encoded_username}/history', params={'limit': 100, **(params or {})}, pages_in_flight=HISTORY_PAGES_IN_FLIGHT, use_cache=not params):
+        if stats is not None:
+            stats['plays'] = stats.get('plays', 0) + len(json_data)
         for item in json_data:
             if item['type'] == 'movie':
                 movie = item.get('movie')
@@ -181,19 +356,17 @@ def get_trakt_watch_history(encoded_username):
                 imdb_movie_id = remove_slashes(imdb_movie_id)
                 trakt_movie_id = movie.get('ids', {}).get('trakt')
                 if trakt_movie_id and trakt_movie_id not in seen_ids:
-                    watched_movies.append({'Title': movie.get('title'), 'Year': movie.get('year'), 'IMDB_ID': imdb_movie_id, 'TraktID': trakt_movie_id, 'Date_Added': item.get('watched_at'), 'WatchedAt': item.get('watched_at'), 'Type': 'movie'})
                     seen_ids.add(trakt_movie_id)
+                    yield {'Title': movie.get('title'), 'Year': movie.get('year'), 'IMDB_ID': imdb_movie_id, 'TraktID': trakt_movie_id, 'Date_Added': item.get('watched_at'), 'WatchedAt': item.get('watched_at'), 'Type': 'movie'}
             elif item['type'] == 'episode':
                 show = item.get('show')
                 imdb_show_id = show.get('ids', {}).get('imdb')
                 imdb_show_id = remove_slashes(imdb_show_id)
                 trakt_show_id = show.get('ids', {}).get('trakt')
-                show_status = show.get('status')
-                aired_episodes = show.get('aired_episodes')
                 
                 if trakt_show_id and trakt_show_id not in seen_ids:
-                    watched_shows.append({'Title': show.get('title'), 'Year': show.get('year'), 'IMDB_ID': imdb_show_id, 'TraktID': trakt_show_id, 'Date_Added': item.get('watched_at'), 'WatchedAt': item.get('watched_at'), 'ShowStatus': show_status, 'AiredEpisodes': aired_episodes, 'Type': 'show'})
                     seen_ids.add(trakt_show_id)
+                    yield {'Title': show.get('title'), 'Year': show.get('year'), 'IMDB_ID': imdb_show_id, 'TraktID': trakt_show_id, 'Date_Added': item.get('watched_at'), 'WatchedAt': item.get('watched_at'), 'Type': 'show'}
 
                 show_title = show.get('title')
                 episode = item.get('episode')
@@ -206,24 +379,405 @@ def get_trakt_watch_history(encoded_username):
                 episode_year = datetime.datetime.strptime(episode.get('first_aired'), "%Y-%m-%dT%H:%M:%S.%fZ").year if episode.get('first_aired') else None
                 watched_at = item.get('watched_at')
                 if trakt_episode_id and trakt_episode_id not in seen_ids:
-                    watched_episodes.append({'Title': episode_title, 'Year': episode_year, 'IMDB_ID': imdb_episode_id, 'TraktID': trakt_episode_id, 'TraktShowID': trakt_show_id, 'SeasonNumber': season_number, 'EpisodeNumber': episode_number, 'Date_Added': watched_at, 'WatchedAt': watched_at, 'Type': 'episode'})
                     seen_ids.add(trakt_episode_id)
+                    episode_counts[trakt_show_id] = episode_counts.get(trakt_show_id, 0) + 1
+                    yield {'Title': episode_title, 'Year': episode_year, 'IMDB_ID': imdb_episode_id, 'TraktID': trakt_episode_id, 'TraktShowID': trakt_show_id, 'SeasonNumber': season_number, 'EpisodeNumber': episode_number, 'Date_Added': watched_at, 'WatchedAt': watched_at, 'Type': 'episode'}
+
+def get_newest_watched_at(*record_lists):
+    """
+    Returns the most recent 'WatchedAt' value of the given record lists, or None.
+    """
+    watched_at_values = [record['WatchedAt'] for records in record_lists for record in records if record.get('WatchedAt')]
+    return max(watched_at_values) if watched_at_values else None
+
+def get_trakt_history_play_count(encoded_username):
+    """
+    Returns the total number of plays in the Trakt watch history, read from the X-Pagination-Item-Count
+    header of a single one-item page, or None if it could not be retrieved.
+    """
+    response = EH.make_trakt_request(f'https://api.trakt.tv/users/{encoded_username}/history', params={'limit': 1})
+    if response is None or response.status_code != 200:
+        return None
+    try:
+        return int(response.headers.get('X-Pagination-Item-Count'))
+    except (TypeError, ValueError):
+        return None
+
+def get_start_at_after(watched_at):
+    """
+    Returns the start_at value one millisecond after watched_at, so plays that are already stored are not requested again.
+    """
+    start_at = datetime.datetime.fromisoformat(watched_at.replace('Z', '+00:00')) + datetime.timedelta(milliseconds=1)
+    return f"{start_at.strftime('%Y-%m-%dT%H:%M:%S')}.{start_at.microsecond // 1000:03d}Z"
+
+def iter_trakt_watch_history(encoded_username, incremental=True):
+    """
+    Yields the Trakt watch history as movie, completed show and episode records. Movies and episodes are
+    yielded as the history pages arrive, completed shows at the end once all episodes were counted.
+
+    With incremental enabled, the normalized history is stored in cache/trakt_history_records.json and
+    later runs only request plays newer than the most recent stored play (start_at), merging them into
+    the stored history. start_at filters on watched_at, so plays added since with an older watched_at
+    (e.g. history posted from IMDB check-ins) would be missed. The total play count reported by Trakt is
+    therefore compared with the stored count plus the new plays, and the full history is downloaded on a
+    mismatch. The full history is also downloaded again every HISTORY_FULL_REFRESH_DAYS days.
+    """
+    # Get Trakt Watch History
+    records_path = os.path.join(HC.get_cache_directory(), 'trakt_history_records.json')
+    stored = HC.read_json_file(records_path) if incremental else None
+    
+    use_stored = False
+    if stored and stored.get('username') == encoded_username and stored.get('newest_watched_at') and stored.get('play_count') is not None:
+        try:
+            full_fetched_at = datetime.datetime.fromisoformat(stored['full_fetched_at'])
+            use_stored = datetime.datetime.now(datetime.timezone.utc) - full_fetched_at < datetime.timedelta(days=HISTORY_FULL_REFRESH_DAYS)
+        except (KeyError, TypeError, ValueError):
+            use_stored = False
+
+    seen_ids = set()
+    episode_counts = {}
+    watched_movies = []
+    watched_shows = []
+    watched_episodes = []
+    records_by_type = {'movie': watched_movies, 'show': watched_shows, 'episode': watched_episodes}
+
+    def collect(records):
+        # Keep every record for storing and the show filter, pass movies and episodes on right away
+        for record in records:
+            records_by_type[record['Type']].append(record)
+            if record['Type'] != 'show':
+                yield record
+
+    def iter_stored_records():
+        for stored_records in [stored['movies'], stored['shows'], stored['episodes']]:
+            for record in stored_records:
+                if record['TraktID'] not in seen_ids:
+                    seen_ids.add(record['TraktID'])
+                    if record['Type'] == 'episode':
+                        episode_counts[record['TraktShowID']] = episode_counts.get(record['TraktShowID'], 0) + 1
+                    yield record
+
+    if use_stored:
+        # Only fetch plays since the last stored play. They are held back until the play counts confirm
+        # no older plays were added or removed since the history was stored.
+        play_count = get_trakt_history_play_count(encoded_username)
+        delta_stats = {'plays': 0}
+        new_records = list(iter_trakt_history_records(encoded_username, seen_ids, episode_counts, params={'start_at': get_start_at_after(stored['newest_watched_at'])}, stats=delta_stats)) if play_count is not None else []
+        if play_count is None or play_count != stored['play_count'] + delta_stats['plays']:
+            EL.logger.info(f"Trakt watch history changed before the last stored play ({play_count} plays, expected {stored['play_count'] + delta_stats['plays']}), downloading the full history")
+            use_stored = False
+            seen_ids.clear()
+            episode_counts.clear()
+
+    if use_stored:
+        # Append the stored records not seen in the new plays
+        yield from collect(new_records)
+        yield from collect(iter_stored_records())
+        full_fetched_at = stored['full_fetched_at']
+    else:
+        full_stats = {'plays': 0}
+        yield from collect(iter_trakt_history_records(encoded_username, seen_ids, episode_counts, stats=full_stats))
+        play_count = full_stats['plays']
+        full_fetched_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    if incremental:
+        try:
+            HC.write_json_file(records_path, {
+                'username': encoded_username,
+                'newest_watched_at': get_newest_watched_at(watched_movies, watched_episodes),
+                'play_count': play_count,
+                'full_fetched_at': full_fetched_at,
+                'movies': watched_movies,
+                'shows': watched_shows,
+                'episodes': watched_episodes
+            })
+        except OSError as e:
+            EL.logger.warning(f"Unable to store Trakt watch history: {e}")
 
     # Filter watched_shows for completed shows where 80% or more of the show has been watched AND where the show's status is "ended" or "cancelled"
-    filtered_watched_shows = []
+    # Watched episode counts per show were collected while parsing, so this is a single pass over the shows
+    show_metadata = get_show_metadata([show['TraktID'] for show in watched_shows])
     for show in watched_shows:
         trakt_show_id = show['TraktID']
-        show_status = show['ShowStatus']
-        aired_episodes = show['AiredEpisodes']
-        episode_numbers = [episode['EpisodeNumber'] for episode in watched_episodes if episode['Type'] == 'episode' and episode['TraktShowID'] == trakt_show_id]
-        unique_watched_episode_count = len(episode_numbers)
+        metadata = show_metadata.get(str(trakt_show_id))
+        if not metadata:
+            continue
+        show_status = metadata.get('status') or ''
+        aired_episodes = metadata.get('aired_episodes') or 0
+        unique_watched_episode_count = episode_counts.get(trakt_show_id, 0)
         
         if (show_status.lower() in ['ended', 'cancelled', 'canceled']) and (unique_watched_episode_count >= 0.8 * int(aired_episodes)):
-            filtered_watched_shows.append(show)
+            yield {**show, 'ShowStatus': show_status, 'AiredEpisodes': aired_episodes}
+
+def get_trakt_watch_history(encoded_username, incremental=True):
+    # Movies first, then completed shows, then episodes
+    trakt_watch_history = sort_by_type(iter_trakt_watch_history(encoded_username, incremental=incremental))
+    
+    return trakt_watch_history
+
+def iter_trakt_watched(encoded_username):
+    """
+    Yields the watched movies, completed shows and watched episodes of the authenticated user from the
+    aggregate /sync/watched endpoints. This needs two requests instead of replaying the whole play log,
+    but only holds the last play of each title and no IMDB IDs for episodes.
+    Episode records carry TraktShowID, SeasonNumber and EpisodeNumber, see resolve_watched_episode_ids().
+
+    Args:
+        encoded_username (str): The Trakt username. Unused, /sync endpoints always return the authenticated user.
+
+    Yields:
+        dict: Movie, completed show and episode records in the format of get_trakt_watch_history().
+    """
+    response = EH.make_trakt_request('https://api.trakt.tv/sync/watched/movies', stream=True)
+    if response is None:
+        raise TraktRequestException("Failed to get watched movies from Trakt.")
+    for item in EH.iter_json_array(response):
+        movie = item.get('movie')
+        imdb_movie_id = remove_slashes(movie.get('ids', {}).get('imdb'))
+        trakt_movie_id = movie.get('ids', {}).get('trakt')
+        watched_at = item.get('last_watched_at')
+        yield {'Title': movie.get('title'), 'Year': movie.get('year'), 'IMDB_ID': imdb_movie_id, 'TraktID': trakt_movie_id, 'Date_Added': watched_at, 'WatchedAt': watched_at, 'Type': 'movie'}
+
+    response = EH.make_trakt_request('https://api.trakt.tv/sync/watched/shows', params={'extended': 'full'}, stream=True)
+    if response is None:
+        raise TraktRequestException("Failed to get watched shows from Trakt.")
+    for item in EH.iter_json_array(response):
+        show = item.get('show')
+        show_title = show.get('title')
+        imdb_show_id = remove_slashes(show.get('ids', {}).get('imdb'))
+        trakt_show_id = show.get('ids', {}).get('trakt')
+        show_status = show.get('status') or ''
+        aired_episodes = show.get('aired_episodes') or 0
+        watched_episode_count = 0
+
+        for season in item.get('seasons') or []:
+            season_number = season.get('number')
+            for episode in season.get('episodes') or []:
+                episode_number = episode.get('number')
+                watched_at = episode.get('last_watched_at')
+                watched_episode_count += 1
+                yield {'Title': f'{show_title}: S{season_number:02}E{episode_number:02}', 'Year': None, 'IMDB_ID': None, 'TraktID': None, 'TraktShowID': trakt_show_id, 'SeasonNumber': season_number, 'EpisodeNumber': episode_number, 'Date_Added': watched_at, 'WatchedAt': watched_at, 'Type': 'episode'}
+
+        # Same completed show filter as get_trakt_watch_history()
+        if (show_status.lower() in ['ended', 'cancelled', 'canceled']) and (watched_episode_count >= 0.8 * int(aired_episodes)):
+            watched_at = item.get('last_watched_at')
+            yield {'Title': show_title, 'Year': show.get('year'), 'IMDB_ID': imdb_show_id, 'TraktID': trakt_show_id, 'Date_Added': watched_at, 'WatchedAt': watched_at, 'ShowStatus': show_status, 'AiredEpisodes': aired_episodes, 'Type': 'show'}
+
+def get_trakt_watched(encoded_username):
+    # Movies first, then completed shows, then episodes
+    trakt_watched = sort_by_type(read_streamed_records(iter_trakt_watched, encoded_username))
+    
+    return trakt_watched
+
+def lookup_episode(imdb_id):
+    """
+    Looks up an IMDB episode ID on Trakt.
+
+    Returns:
+        dict: {'TraktID', 'TraktShowID', 'SeasonNumber', 'EpisodeNumber'}, an empty dict if the ID is not
+        a Trakt episode, or None if the lookup failed.
+    """
+    response = EH.make_trakt_request(f'https://api.trakt.tv/search/imdb/{imdb_id}', params={'type': 'episode'})
+    if response is None or response.status_code != 200:
+        return None
+    try:
+        results = json.loads(response.text)
+    except ValueError:
+        return None
+    for result in results:
+        episode = result.get('episode') or {}
+        show = result.get('show') or {}
+        if result.get('type') == 'episode' and episode and show:
+            return {'TraktID': (episode.get('ids') or {}).get('trakt'), 'TraktShowID': (show.get('ids') or {}).get('trakt'), 'SeasonNumber': episode.get('season'), 'EpisodeNumber': episode.get('number')}
+    return {}
+
+def get_episode_ids(imdb_ids):
+    """
+    Returns the Trakt show, season and episode numbers of IMDB episode IDs.
+    Episode IDs never change, so lookups are stored in cache/trakt_episode_ids.json and only unknown
+    IDs are looked up (concurrently) on Trakt.
+
+    Returns:
+        dict: {imdb_id: {'TraktID', 'TraktShowID', 'SeasonNumber', 'EpisodeNumber'}} for every ID found on Trakt.
+    """
+    episode_ids_path = os.path.join(HC.get_cache_directory(), 'trakt_episode_ids.json')
+    episode_ids = HC.read_json_file(episode_ids_path, default={})
+    missing_ids = [imdb_id for imdb_id in dict.fromkeys(imdb_ids) if imdb_id not in episode_ids]
+    if missing_ids:
+        with ThreadPoolExecutor(max_workers=EPISODE_LOOKUP_WORKERS) as executor:
+            for imdb_id, episode in zip(missing_ids, executor.map(lookup_episode, missing_ids)):
+                # Failed lookups are not stored, so they are tried again next run
+                if episode is not None:
+                    episode_ids[imdb_id] = episode
+        try:
+            HC.write_json_file(episode_ids_path, episode_ids)
+        except OSError as e:
+            EL.logger.warning(f"Unable to store Trakt episode IDs: {e}")
+    return {imdb_id: episode_ids[imdb_id] for imdb_id in imdb_ids if episode_ids.get(imdb_id)}
 
-    # Update watched_shows with the filtered results
-    watched_shows = filtered_watched_shows
+def resolve_watched_episode_ids(trakt_watched, trakt_watchlist, imdb_watchlist=None):
+    """
+    Fills in the IMDB_ID, TraktID and Title of get_trakt_watched() episode records from the watchlist
+    episodes with the same show, season and episode number. Trakt watchlist episodes carry these
+    numbers, IMDB watchlist episodes are looked up with get_episode_ids(). Other episodes keep IMDB_ID None.
 
-    trakt_watch_history = watched_movies + watched_shows + watched_episodes
+    Returns:
+        list: trakt_watched with the matching episode records updated.
+    """
+    watchlist_episodes = {(item.get('TraktShowID'), item.get('SeasonNumber'), item.get('EpisodeNumber')): item for item in trakt_watchlist if item['Type'] == 'episode'}
     
-    return trakt_watch_history
\ No newline at end of file
+    # IMDB watchlist episodes that are not on the Trakt watchlist
+    trakt_watchlist_ids = set(item['IMDB_ID'] for item in trakt_watchlist)
+    imdb_episodes = [item for item in imdb_watchlist or [] if item['Type'] == 'episode' and item['IMDB_ID'] not in trakt_watchlist_ids]
+    if imdb_episodes:
+        episode_ids = get_episode_ids([item['IMDB_ID'] for item in imdb_episodes])
+        for item in imdb_episodes:
+            episode = episode_ids.get(item['IMDB_ID'])
+            if episode:
+                key = (episode['TraktShowID'], episode['SeasonNumber'], episode['EpisodeNumber'])
+                watchlist_episodes.setdefault(key, {**item, 'TraktID': episode['TraktID']})
+    
+    resolved = []
+    for record in trakt_watched:
+        if record['Type'] == 'episode' and record['IMDB_ID'] is None:
+            watchlist_item = watchlist_episodes.get((record['TraktShowID'], record['SeasonNumber'], record['EpisodeNumber']))
+            if watchlist_item:
+                record = {**record, 'Title': watchlist_item['Title'], 'IMDB_ID': watchlist_item['IMDB_ID'], 'TraktID': watchlist_item['TraktID']}
+        resolved.append(record)
+    return resolved
+
+def fetch_show_metadata(trakt_show_ids):
+    """
+    Downloads the status and aired episode count of the given Trakt shows.
+    A single /sync/watched/shows request is used when many shows are needed, otherwise the shows are
+    requested individually (concurrently) from /shows/{id}.
+
+    Returns:
+        dict: {trakt_show_id (str): {'status': str, 'aired_episodes': int}} for every show that could be fetched.
+    """
+    metadata = {}
+
+    def add_metadata(show):
+        trakt_show_id = (show.get('ids') or {}).get('trakt')
+        if trakt_show_id:
+            metadata[str(trakt_show_id)] = {'status': show.get('status'), 'aired_episodes': show.get('aired_episodes')}
+
+    if len(trakt_show_ids) > SHOW_METADATA_BULK_THRESHOLD:
+        response = EH.make_trakt_request('https://api.trakt.tv/sync/watched/shows', params={'extended': 'full,noseasons'})
+        if response is not None:
+            for item in json.loads(response.text):
+                add_metadata(item.get('show') or {})
+
+    missing_ids = [trakt_show_id for trakt_show_id in trakt_show_ids if str(trakt_show_id) not in metadata]
+    if missing_ids:
+        def fetch_show(trakt_show_id):
+            return EH.make_trakt_request(f'https://api.trakt.tv/shows/{trakt_show_id}', params={'extended': 'full'})
+
+        with ThreadPoolExecutor(max_workers=HISTORY_PAGES_IN_FLIGHT) as executor:
+            for trakt_show_id, response in zip(missing_ids, executor.map(fetch_show, missing_ids)):
+                if response is not None:
+                    add_metadata(json.loads(response.text))
+                else:
+                    EL.logger.warning(f"Unable to get Trakt show metadata for show {trakt_show_id}")
+
+    return metadata
+
+def get_show_metadata(trakt_show_ids):
+    """
+    Returns the status and aired episode count of the given Trakt shows.
+
+    Metadata is stored in cache/trakt_show_metadata.json keyed by Trakt show ID. Only shows that are
+    missing or older than SHOW_METADATA_MAX_AGE_HOURS are downloaded again.
+
+    Args:
+        trakt_show_ids (list): Trakt show IDs.
+
+    Returns:
+        dict: {trakt_show_id (str): {'status': str, 'aired_episodes': int, 'fetched_at': str}}
+    """
+    metadata_path = os.path.join(HC.get_cache_directory(), 'trakt_show_metadata.json')
+    stored = HC.read_json_file(metadata_path, default={})
+    shows = stored.get('shows', {}) if isinstance(stored, dict) else {}
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    max_age = datetime.timedelta(hours=SHOW_METADATA_MAX_AGE_HOURS)
+
+    def is_fresh(entry):
+        try:
+            return now - datetime.datetime.fromisoformat(entry['fetched_at']) < max_age
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    stale_ids = [trakt_show_id for trakt_show_id in dict.fromkeys(trakt_show_ids) if not is_fresh(shows.get(str(trakt_show_id)) or {})]
+    if stale_ids:
+        fetched_at = now.isoformat()
+        for trakt_show_id, entry in fetch_show_metadata(stale_ids).items():
+            shows[trakt_show_id] = {**entry, 'fetched_at': fetched_at}
+        try:
+            HC.write_json_file(metadata_path, {'shows': shows})
+        except OSError as e:
+            EL.logger.warning(f"Unable to store Trakt show metadata: {e}")
+
+    return shows
+
+def get_trakt_last_activities():
+    """
+    Returns the /sync/last_activities timestamps, or None if they could not be retrieved.
+    """
+    response = EH.make_trakt_request('https://api.trakt.tv/sync/last_activities')
+    if response is None or response.status_code != 200:
+        return None
+    try:
+        return json.loads(response.text)
+    except ValueError:
+        return None
+
+def get_activity_fingerprint(last_activities, category):
+    """
+    Returns the last_activities timestamps relevant to a category, e.g. {'movies.rated_at': '2024-01-01T00:00:00.000Z', ...}.
+    """
+    return {f'{section}.{key}': (last_activities.get(section) or {}).get(key) for section, key in ACTIVITY_KEYS[category]}
+
+def get_trakt_data_if_changed(category, encoded_username, last_activities, fetch_function):
+    """
+    Returns the Trakt data of a category, downloading it only if its /sync/last_activities timestamps
+    changed since it was last downloaded. Otherwise the data stored by the previous run is returned.
+
+    Args:
+        category (str): One of the ACTIVITY_KEYS categories ('watchlist', 'ratings', 'comments', 'history', 'watched').
+        encoded_username (str): The Trakt username the data belongs to.
+        last_activities (dict): The current /sync/last_activities response, or None to always download.
+        fetch_function (callable): Function taking encoded_username and returning the category data.
+
+    Returns:
+        list: The category data.
+    """
+    snapshot_path = os.path.join(HC.get_cache_directory(), f'trakt_{category}.json')
+
+    if last_activities:
+        fingerprint = get_activity_fingerprint(last_activities, category)
+        snapshot = HC.read_json_file(snapshot_path)
+        if snapshot and snapshot.get('username') == encoded_username and snapshot.get('activities') == fingerprint:
+            try:
+                fetched_at = datetime.datetime.fromisoformat(snapshot['fetched_at'])
+                is_fresh = datetime.datetime.now(datetime.timezone.utc) - fetched_at < datetime.timedelta(hours=SNAPSHOT_MAX_AGE_HOURS)
+            except (KeyError, TypeError, ValueError):
+                is_fresh = False
+            if is_fresh:
+                print(f" - Trakt {category} unchanged since last run, using stored data")
+                return snapshot['data']
+
+    data = fetch_function(encoded_username)
+
+    if last_activities:
+        try:
+            HC.write_json_file(snapshot_path, {
+                'username': encoded_username,
+                'activities': fingerprint,
+                'fetched_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'data': data
+            })
+        except OSError as e:
+            EL.logger.warning(f"Unable to store Trakt {category} data: {e}")
+
+    return data
\ No newline at end of file
@@ -2,6 +2,7 @@ import os
 import json
 import sys
 import datetime
+import threading
 from datetime import timezone
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -11,10 +12,159 @@ from IMDBTraktSyncer import errorLogger as EL
 def print_directory(main_directory):
     print(f"Your settings are saved at:\n{main_directory}")
 
-def prompt_get_credentials():
-    # Define the file path
+# Process-wide credentials cache, loaded from credentials.txt once per run
+_credentials_cache = None
+_credentials_lock = threading.RLock()
+
+# Refresh the access token when it expires within this many seconds
+TOKEN_REFRESH_MARGIN = 60
+
+# Refresh the access token in the background this many seconds before it expires
+TOKEN_BACKGROUND_REFRESH_MARGIN = 15 * 60
+
+# Pending background refresh, see schedule_token_refresh()
+_refresh_timer = None
+
+# Cleared while a background refresh is calling the OAuth endpoint, set again when it is done
+_background_refresh_done = threading.Event()
+_background_refresh_done.set()
+
+def get_credentials_file_path():
     here = os.path.abspath(os.path.dirname(__file__))
-    file_path = os.path.join(here, 'credentials.txt')
+    return os.path.join(here, 'credentials.txt')
+
+def load_credentials_file():
+    """
+    Reads and parses credentials.txt.
+
+    Returns:
+        dict: The file contents, or an empty dict if the file is missing, empty or invalid.
+    """
+    file_path = get_credentials_file_path()
+    if os.path.isfile(file_path) and os.path.getsize(file_path) > 0:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            try:
+                return json.load(f)
+            except json.decoder.JSONDecodeError as e:
+                print(f"JSON Decode Error: {e}")
+    return {}
+
+def save_credentials(values):
+    """
+    Merges the given values into credentials.txt. The file is re-read first so
+    settings written by other prompts since the cache was loaded are kept.
+    """
+    file_data = load_credentials_file()
+    file_data.update(values)
+    with open(get_credentials_file_path(), 'w', encoding='utf-8') as f:
+        json.dump(file_data, f, indent=4, separators=(', ', ': '))
+
+def token_needs_refresh(trakt_token_expires):
+    """
+    Returns True if the access token is missing, unparsable or expires within TOKEN_REFRESH_MARGIN seconds.
+    """
+    if trakt_token_expires == "empty":
+        return True
+    expiration_time = get_token_expiration_time(trakt_token_expires)
+    if expiration_time is None:
+        return True  # Invalid date format, force refresh
+    return datetime.datetime.now(timezone.utc) >= expiration_time - datetime.timedelta(seconds=TOKEN_REFRESH_MARGIN)
+
+def get_token_expiration_time(trakt_token_expires):
+    try:
+        return datetime.datetime.fromisoformat(trakt_token_expires).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+def schedule_token_refresh(trakt_token_expires):
+    """
+    Starts a timer that refreshes the access token TOKEN_BACKGROUND_REFRESH_MARGIN seconds before it
+    expires, so requests never have to wait for a refresh. Replaces any earlier timer.
+    Must be called with _credentials_lock held.
+    """
+    global _refresh_timer
+
+    cancel_token_refresh()
+    expiration_time = get_token_expiration_time(trakt_token_expires)
+    if expiration_time is None:
+        return
+    delay = (expiration_time - datetime.datetime.now(timezone.utc)).total_seconds() - TOKEN_BACKGROUND_REFRESH_MARGIN
+    if delay <= 0:
+        # Too close to expiry, the next prompt_get_credentials() call refreshes it
+        return
+    if delay > threading.TIMEOUT_MAX:
+        # Expires far beyond the length of a run (and the platform's timer limit)
+        return
+    _refresh_timer = threading.Timer(delay, refresh_token_in_background)
+    _refresh_timer.daemon = True
+    _refresh_timer.start()
+
+def cancel_token_refresh():
+    """
+    Cancels the pending background token refresh, if any.
+    """
+    global _refresh_timer
+
+    with _credentials_lock:
+        if _refresh_timer is not None:
+            _refresh_timer.cancel()
+            _refresh_timer = None
+
+def refresh_token_in_background():
+    """
+    Timer callback that refreshes the access token with the refresh token. Never prompts the user;
+    if the refresh fails, the token is refreshed (or re-authorized) by the next foreground call.
+
+    The OAuth request is sent without holding _credentials_lock, so requests keep using the current
+    token (still valid for TOKEN_BACKGROUND_REFRESH_MARGIN seconds) meanwhile. Only callers whose token
+    is within TOKEN_REFRESH_MARGIN of expiring wait for it, see prompt_get_credentials().
+    """
+    global _refresh_timer
+
+    with _credentials_lock:
+        _refresh_timer = None
+        values = _credentials_cache
+        if values is None or values.get("trakt_refresh_token", "empty") == "empty":
+            return
+        refresh_token = values["trakt_refresh_token"]
+        _background_refresh_done.clear()
+
+    tokens = None
+    try:
+        tokens = authTrakt.authenticate(values["trakt_client_id"], values["trakt_client_secret"], refresh_token, interactive=False)
+        if tokens is None:
+            EL.logger.warning("Background Trakt token refresh was rejected, the token will be refreshed on next use.")
+    except Exception as e:
+        EL.logger.warning(f"Background Trakt token refresh failed: {e}", exc_info=True)
+    finally:
+        with _credentials_lock:
+            # Skip the result if the tokens were replaced by a foreground refresh meanwhile
+            if tokens is not None and values.get("trakt_refresh_token") == refresh_token:
+                update_tokens(values, tokens)
+            _background_refresh_done.set()
+
+def update_tokens(values, tokens):
+    """
+    Stores new tokens in the cached credentials and credentials.txt and schedules the next refresh.
+    Must be called with _credentials_lock held.
+    """
+    values["trakt_access_token"], values["trakt_refresh_token"], values["trakt_token_expires"] = tokens
+    save_credentials(values)
+    schedule_token_refresh(values["trakt_token_expires"])
+
+def prompt_get_credentials():
+    """
+    Returns the Trakt and IMDB credentials. credentials.txt is read once per run and kept in memory,
+    the Trakt token is only refreshed when it is about to expire, and the file is only written when
+    something changed.
+
+    All access goes through _credentials_lock, so when several threads need a refresh at the same time
+    only the first one calls the OAuth endpoint and the others wait for and reuse its new token.
+    The token is also refreshed in the background shortly before it expires, see schedule_token_refresh().
+    If the token is about to expire while that background refresh is running, callers wait for it
+    instead of starting a second refresh.
+    """
+    global _credentials_cache
 
     # Default values for missing credentials
     default_values = {
@@ -27,74 +177,78 @@ def prompt_get_credentials():
         "imdb_password": "empty"
     }
 
-    # Load existing file data
-    if os.path.isfile(file_path) and os.path.getsize(file_path) > 0:
-        # Read the credentials file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            try:
-                file_data = json.load(f)
-            except json.decoder.JSONDecodeError as e:
-                print(f"JSON Decode Error: {e}")
-                file_data = {}  # Handle invalid JSON
-    else:
-        file_data = {}
-
-    # Update only the keys related to default values
-    values = {key: file_data.get(key, default_value) for key, default_value in default_values.items()}
-    
-    # Prompt user for missing credentials, excluding tokens
-    for key, value in values.items():
-        if value == "empty" and key not in ["trakt_access_token", "trakt_refresh_token", "trakt_token_expires"]:
-            if key == "imdb_username":
-                prompt_message = f"Please enter a value for {key} (email or phone number): "
-            elif key == "trakt_client_id":
-                print("\n")
-                print("***** TRAKT API SETUP *****")
-                print("Follow the instructions to setup your Trakt API application:")
-                print("  1. Login to Trakt and navigate to your API apps page: https://trakt.tv/oauth/applications")
-                print("  2. Create a new API application named 'IMDBTraktSyncer'.")
-                print("  3. Use 'urn:ietf:wg:oauth:2.0:oob' as the Redirect URI.")
-                print("\n")
-                prompt_message = "Please enter your Trakt Client ID: "
-            else:
-                prompt_message = f"Please enter a value for {key}: "
-            values[key] = input(prompt_message).strip()
-
-    # Handle token refresh if necessary
-    should_refresh = True
-    trakt_token_expires = values.get("trakt_token_expires", "empty")
-    
-    if trakt_token_expires != "empty":
-        try:
-            expiration_time = datetime.datetime.fromisoformat(trakt_token_expires).replace(tzinfo=timezone.utc)
-            if datetime.datetime.now(timezone.utc) < expiration_time:
-                should_refresh = False
-        except ValueError:
-            pass  # Invalid date format, force refresh
-    
-    if should_refresh:
-        client_id = values["trakt_client_id"]
-        client_secret = values["trakt_client_secret"]
-        refresh_token = values.get("trakt_refresh_token", "empty")
-
-        if refresh_token != "empty":
-            access_token, refresh_token, expiration_time = authTrakt.authenticate(client_id, client_secret, refresh_token)
-        else:
-            access_token, refresh_token, expiration_time = authTrakt.authenticate(client_id, client_secret)
+    changed = False
+    while True:
+        with _credentials_lock:
+            if _credentials_cache is None:
+                # Load existing file data
+                file_data = load_credentials_file()
+
+                # Update only the keys related to default values
+                values = {key: file_data.get(key, default_value) for key, default_value in default_values.items()}
+            
+                # Prompt user for missing credentials, excluding tokens
+                for key, value in values.items():
+                    if value == "empty" and key not in ["trakt_access_token", "trakt_refresh_token", "trakt_token_expires"]:
+                        if key == "imdb_username":
+                            prompt_message = f"Please enter a value for {key} (email or phone number): "
+                        elif key == "trakt_client_id":
+                            print("\n")
+                            print("***** TRAKT API SETUP *****")
+                            print("Follow the instructions to setup your Trakt API application:")
+                            print("  1. Login to Trakt and navigate to your API apps page: https://trakt.tv/oauth/applications")
+                            print("  2. Create a new API application named 'IMDBTraktSyncer'.")
+                            print("  3. Use 'urn:ietf:wg:oauth:2.0:oob' as the Redirect URI.")
+                            print("\n")
+                            prompt_message = "Please enter your Trakt Client ID: "
+                        else:
+                            prompt_message = f"Please enter a value for {key}: "
+                        values[key] = input(prompt_message).strip()
+                        changed = True
+            
+                _credentials_cache = values
+                if not token_needs_refresh(values.get("trakt_token_expires", "empty")):
+                    schedule_token_refresh(values["trakt_token_expires"])
         
-        values["trakt_access_token"] = access_token
-        values["trakt_refresh_token"] = refresh_token
-        values["trakt_token_expires"] = expiration_time
+            values = _credentials_cache
+
+            # Handle token refresh if necessary
+            if token_needs_refresh(values.get("trakt_token_expires", "empty")):
+                if _background_refresh_done.is_set():
+                    client_id = values["trakt_client_id"]
+                    client_secret = values["trakt_client_secret"]
+                    refresh_token = values.get("trakt_refresh_token", "empty")
+
+                    if refresh_token != "empty":
+                        tokens = authTrakt.authenticate(client_id, client_secret, refresh_token)
+                    else:
+                        tokens = authTrakt.authenticate(client_id, client_secret)
+                
+                    # Saves the credentials and schedules the next background refresh
+                    update_tokens(values, tokens)
+                    return values["trakt_client_id"], values["trakt_client_secret"], values["trakt_access_token"], values["trakt_refresh_token"], values["imdb_username"], values["imdb_password"]
+            else:
+                if changed:
+                    # Save updated credentials back to the file only if something changed
+                    save_credentials(values)
 
-    # Merge updated credentials back into the file data
-    file_data.update(values)
+                # Return the credentials
+                return values["trakt_client_id"], values["trakt_client_secret"], values["trakt_access_token"], values["trakt_refresh_token"], values["imdb_username"], values["imdb_password"]
 
-    # Save updated credentials back to the file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(file_data, f, indent=4, separators=(', ', ': '))
+        # The token is about to expire and a background refresh is already requesting a new one, wait for it and check again
+        _background_refresh_done.wait()
 
-    # Return the credentials
-    return values["trakt_client_id"], values["trakt_client_secret"], values["trakt_access_token"], values["trakt_refresh_token"], values["imdb_username"], values["imdb_password"]
+def get_trakt_headers():
+    """
+    Returns the default Trakt API request headers built from the cached credentials.
+    """
+    trakt_client_id, _, trakt_access_token, _, _, _ = prompt_get_credentials()
+    return {
+        'Content-Type': 'application/json',
+        'trakt-api-version': '2',
+        'trakt-api-key': trakt_client_id,
+        'Authorization': f'Bearer {trakt_access_token}'
+    }
 
 def prompt_sync_ratings():
     """